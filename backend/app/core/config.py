@@ -7,6 +7,52 @@ class Settings(BaseSettings):
     ALLOWED_ORIGINS: list = ["http://localhost:3000"]
     allow_credentials: bool = False
 
+    # Log ingestion (incremental tailer)
+    LOG_TAIL_INTERVAL: float = 1.0 # detik antar poll di background
+    LOG_RETENTION_DAYS: int = 7 # range terpanjang di dashboard
+    LOG_INDEX_PATH: str = "" # kosong = ACCESS_LOG_PATH + ".tidx"
+    LOG_INDEX_STRIDE_LINES: int = 1000 # satu entry index per N baris (atau per menit)
+    LOG_PARSE_WORKERS: int = 1 # proses parser untuk backfill besar; 1 = tanpa paralel, 0 = jumlah CPU (scaling multi-core belum diukur)
+    LOG_PARSE_PARALLEL_MIN_MB: int = 64 # backlog minimal sebelum parse paralel dipakai
+
+    # Rollup counters untuk /api/stats
+    ROLLUP_MINUTE_RETENTION_DAYS: int = 7 # cell per menit, lebih lama dipadatkan per jam
+    ROLLUP_HOUR_RETENTION_DAYS: int = 90
+
+    # Active IPs: counter Space-Saving per slice 5 menit (memori tetap walau ada jutaan IP)
+    ACTIVE_IP_COUNTERS: int = 1000
+    ACTIVE_IP_WINDOW_MINUTES: int = 60 # window terpanjang yang bisa diminta dari /api/waf/active-ips
+
+    # GeoIP offline: CSV range (DB-IP/IP2Location), GeoLite2 CSV, atau .mmdb (butuh maxminddb)
+    GEOIP_DB_PATH: str = "" # kosong = country "Unknown"
+    GEOIP_CACHE_SIZE: int = 65536
+
+    # Reload Caddy digabung: tunggu sampai tidak ada perubahan selama debounce
+    CADDY_RELOAD_DEBOUNCE_SECONDS: float = 1.0
+    CADDY_RELOAD_MAX_DELAY_SECONDS: float = 10.0 # batas tunda saat perubahan terus masuk
+
+    # Auto-ban: IP dengan >= THRESHOLD request 403/401 dalam WINDOW detik diblok sementara
+    AUTO_BAN_ENABLED: bool = False
+    AUTO_BAN_THRESHOLD: int = 20
+    AUTO_BAN_WINDOW_SECONDS: int = 60
+    AUTO_BAN_DURATION: str = "1h" # format sama dengan kolom duration (24h, 7d, ...)
+    AUTO_BAN_FLUSH_SECONDS: float = 5.0 # kandidat ban digabung per interval ini
+
+    # Sampler psutil untuk /api/system/status
+    SYSTEM_SAMPLE_INTERVAL: float = 2.0 # detik antar sample
+    SYSTEM_HISTORY_SIZE: int = 1800 # jumlah sample di ring buffer (1 jam @ 2 detik)
+    SERVICE_STATUS_TTL: float = 10.0 # detik cache status systemd (satu systemctl show untuk semua unit)
+
+    # SQLite: pool koneksi (WAL, synchronous=NORMAL)
+    SQLITE_POOL_SIZE: int = 8 # koneksi idle yang disimpan
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_MB: int = 16 # page cache per koneksi
+    SQLITE_MMAP_MB: int = 256
+
+    # Tabel waf_events untuk /api/logs
+    EVENT_RETENTION_DAYS: int = 30
+    LOG_COUNT_CAP: int = 10_000 # batas COUNT(*) untuk total di Logs Explorer
+
     class Config:
         env_file = ".env"
 
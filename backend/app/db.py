@@ -1,19 +1,200 @@
 import sqlite3
 import os
 import json
+import queue
+import threading
 from contextlib import contextmanager
+from app.core.config import get_settings
+
+settings = get_settings()
 
 DB_FILE = os.path.join(os.path.dirname(__file__), "..", "waf_data.db")
 
+
+class ConnectionPool:
+    """Reusable SQLite connections, configured once when opened.
+
+    Every connection runs in WAL mode (readers no longer wait for the
+    ingest writer, and vice versa) with synchronous=NORMAL, a shared page
+    cache budget, mmap reads and a busy timeout instead of instant
+    "database is locked" errors. Up to ``size`` idle connections are kept;
+    when all are checked out a new one is opened rather than waiting, and
+    surplus ones are closed on return.
+    """
+
+    def __init__(self, path: str, size: int = 8):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._journal_checked = False
+        self._trace = None
+
+    def set_trace_callback(self, callback):
+        """Call ``callback(sql)`` for every statement run on connections borrowed
+        from now on (None turns it off), e.g. to check query plans."""
+        self._trace = callback
+
+    def _connect(self):
+        # Koneksi dipinjam bergantian oleh thread berbeda, tapi tidak pernah bersamaan
+        conn = sqlite3.connect(self.path, timeout=settings.SQLITE_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        # Return dict-like rows
+        conn.row_factory = sqlite3.Row
+        with self._lock:
+            if not self._journal_checked:
+                # journal_mode=WAL tersimpan di file DB, cukup sekali
+                mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+                if mode.lower() != "wal":
+                    print(f"SQLite WAL unavailable, using journal_mode={mode}")
+                self._journal_checked = True
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        # Nilai negatif = KiB
+        conn.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_MB * 1024)}")
+        conn.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_MB * 1024 * 1024)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        conn.set_trace_callback(self._trace)
+        return conn
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                # Sama seperti close(): perubahan yang tidak di-commit dibuang
+                conn.rollback()
+        except sqlite3.Error:
+            # Koneksi rusak tidak dikembalikan ke pool
+            conn.close()
+            return
+        if self._idle.qsize() < self.size:
+            self._idle.put(conn)
+        else:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """Pool for the current DB_FILE (rebuilt if DB_FILE is pointed elsewhere)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.path != DB_FILE:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(DB_FILE, settings.SQLITE_POOL_SIZE)
+        return _pool
+
+def close_pool():
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+
 @contextmanager
 def get_db_connection():
-    conn = sqlite3.connect(DB_FILE)
-    # Return dict-like rows
-    conn.row_factory = sqlite3.Row
+    pool = get_pool()
+    conn = pool.acquire()
     try:
         yield conn
     finally:
-        conn.close()
+        pool.release(conn)
+
+def ensure_column(cursor, table: str, column: str, decl: str):
+    """Add a column to an existing table created by an older version"""
+    columns = [r[1] for r in cursor.execute(f"PRAGMA table_info({table})").fetchall()]
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+def init_event_search(cursor) -> bool:
+    """Trigram FTS5 index over waf_events.
+
+    Kept in sync by EventStore with one bulk INSERT ... SELECT per batch
+    instead of per-row triggers, which cut ingest throughput several times.
+    Needs SQLite >= 3.34 built with FTS5; without it search falls back to LIKE.
+    """
+    exists = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'waf_events_fts'").fetchone()
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS waf_events_fts USING fts5(
+                ip, path, user_agent, attack_type,
+                content='waf_events', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"Full-text search unavailable ({e}), using LIKE fallback.")
+        return False
+
+    if not exists:
+        # Index rows that were stored before the FTS table existed
+        cursor.execute("INSERT INTO waf_events_fts (waf_events_fts) VALUES ('rebuild')")
+    return True
+
+def migrate_event_indexes(cursor):
+    # ip_key: alamat 16 byte (IPv4 dipetakan ke ::ffff:a.b.c.d) untuk query CIDR
+    ensure_column(cursor, "waf_events", "ip_key", "BLOB")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_waf_events_ts ON waf_events (ts)")
+    # Filter + ORDER BY ts in one index walk
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_waf_events_status ON waf_events (status, ts)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_waf_events_attack_type ON waf_events (attack_type, ts)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_waf_events_ip ON waf_events (ip, ts)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_waf_events_ip_key ON waf_events (ip_key)")
+
+# (versi, deskripsi, langkah). Langkah = SQL atau fungsi(cursor); semuanya harus
+# idempotent karena DB lama bisa sudah punya sebagian index tanpa user_version.
+# Tambah versi baru di akhir, jangan ubah versi yang sudah rilis.
+MIGRATIONS = [
+    (1, "waf_events ip_key column and indexes", [migrate_event_indexes]),
+    (2, "ip_rules indexes for listing, config sync and ban expiry", [
+        # get_ip_rules: ORDER BY created_at DESC tanpa sort
+        "CREATE INDEX IF NOT EXISTS idx_ip_rules_created_at ON ip_rules (created_at)",
+        # sync_ip_rules_file / get_rule_matcher: WHERE status = 'Active' (covering)
+        "CREATE INDEX IF NOT EXISTS idx_ip_rules_status ON ip_rules (status, action, ip)",
+        # RuleExpiry.load: hanya ban sementara yang masuk index
+        "CREATE INDEX IF NOT EXISTS idx_ip_rules_expiring ON ip_rules (duration, created_at, ip) WHERE duration != 'Permanent'",
+    ]),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def run_migrations(conn):
+    """Apply every migration newer than the DB's PRAGMA user_version, each in its own transaction"""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version > SCHEMA_VERSION:
+        print(f"Database schema v{version} is newer than this app (v{SCHEMA_VERSION}), skipping migrations.")
+        return version
+
+    for target, description, steps in MIGRATIONS:
+        if target <= version:
+            continue
+        cursor = conn.cursor()
+        # DDL tidak membuka transaksi otomatis di sqlite3: BEGIN eksplisit supaya atomik
+        cursor.execute("BEGIN")
+        try:
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            cursor.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = target
+        print(f"Database migrated to v{target}: {description}")
+    return version
 
 def init_db():
     with get_db_connection() as conn:
@@ -60,8 +241,30 @@ def init_db():
             )
         ''')
         
+        # 5. Parsed access log events (Logs Explorer)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS waf_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts REAL NOT NULL,
+                ip TEXT NOT NULL,
+                method TEXT,
+                path TEXT,
+                status INTEGER,
+                attack_type TEXT,
+                country TEXT,
+                user_agent TEXT,
+                ip_key BLOB
+            )
+        ''')
+
+        # 6. Full-text search index for the Logs Explorer search box
+        init_event_search(cursor)
+
         conn.commit()
 
+        # 7. Index & perubahan skema bertahap (PRAGMA user_version)
+        run_migrations(conn)
+
         # Seed Default Admin if not exists
         cursor.execute("SELECT * FROM users WHERE username = ?", ("admin",))
         if not cursor.fetchone():
@@ -1,9 +1,11 @@
 from typing import List
-from fastapi import FastAPI, Depends, HTTPException, status, Response
+from fastapi import FastAPI, Depends, HTTPException, status, Response, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 
-from app.models.schemas import StatsResponse, WafRuleRequest, CommandResponse, WafRuleStatus, RuleToggleRequest, LoginRequest, CustomRuleRequest, IpRule, ActiveIp, SystemHealth, WafLogListResponse, ProfileUpdateRequest, PasswordChangeRequest, UserResponse, HotlinkConfig
+from app.models.schemas import StatsResponse, WafRuleRequest, CommandResponse, WafRuleStatus, RuleToggleRequest, LoginRequest, CustomRuleRequest, IpRule, ActiveIp, SystemHealth, ReloadStatus, WafLogListResponse, ProfileUpdateRequest, PasswordChangeRequest, UserResponse, HotlinkConfig
 from app.services import log_service, system_service, auth_service
 from app.core.config import get_settings
 
@@ -19,11 +21,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-from app.db import init_db
+from app.db import init_db, close_pool
 
 @app.on_event("startup")
 def on_startup():
     init_db()
+    log_service.get_tailer().start(settings.LOG_TAIL_INTERVAL)
+    system_service.get_rule_expiry().start()
+    system_service.get_metrics_sampler().start()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    log_service.get_tailer().stop()
+    system_service.get_rule_expiry().stop()
+    system_service.get_metrics_sampler().stop()
+    # Perubahan yang masih antri tetap diterapkan
+    system_service.get_reload_scheduler().stop()
+    close_pool()
 
 # --- Public Endpoints ---
 
@@ -62,8 +76,11 @@ def get_stats(range: str = "live", user = Depends(auth_service.get_current_user)
 @app.get("/api/reports/export")
 def export_report(format: str = "html", time_range: str = "24h", user = Depends(auth_service.get_current_user)):
     if format == "csv":
-        csv_content = log_service.export_logs_csv()
-        return Response(content=csv_content, media_type="text/csv", headers={"Content-Disposition": "attachment; filename=waf_report.csv"})
+        return StreamingResponse(
+            log_service.export_logs_csv(time_range),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=waf_report.csv"},
+        )
     else:
         # Default to HTML
         html_content = log_service.generate_html_report(time_range)
@@ -85,9 +102,36 @@ def add_rule(rule: WafRuleRequest, user = Depends(auth_service.get_current_user)
 def get_ip_rules(user = Depends(auth_service.get_current_user)):
     return system_service.get_ip_rules()
 
+@app.post("/api/waf/ip-rules/import")
+async def import_ip_rules(
+    request: Request,
+    format: str = "auto",
+    action: str = "deny",
+    note: str = "",
+    duration: str = "Permanent",
+    user = Depends(auth_service.get_current_user)
+):
+    # Body mentah: JSON, CSV, atau satu IP/CIDR per baris (threat feed)
+    body = (await request.body()).decode("utf-8", errors="replace")
+    return await run_in_threadpool(system_service.import_ip_rules, body, format, action, note, duration)
+
+@app.get("/api/waf/ip-rules/export")
+def export_ip_rules(format: str = "csv", user = Depends(auth_service.get_current_user)):
+    media_types = {"csv": "text/csv", "json": "application/json", "txt": "text/plain"}
+    if format not in media_types:
+        raise HTTPException(status_code=400, detail="format must be csv, json or txt")
+    return StreamingResponse(
+        system_service.export_ip_rules(format),
+        media_type=media_types[format],
+        headers={"Content-Disposition": f"attachment; filename=ip_rules.{format}"},
+    )
+
 @app.get("/api/waf/active-ips", response_model=List[ActiveIp])
-def get_active_ips(user = Depends(auth_service.get_current_user)):
-    return log_service.get_active_ips()
+def get_active_ips(window_minutes: int = None, user = Depends(auth_service.get_current_user)):
+    try:
+        return log_service.get_active_ips(window_minutes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/logs", response_model=WafLogListResponse)
 def get_waf_logs(
@@ -97,9 +141,10 @@ def get_waf_logs(
     status: str = "All", 
     attack_type: str = "All",
     time_range: str = "Last 24h",
+    cursor: str = None,
     user = Depends(auth_service.get_current_user)
 ):
-    return log_service.get_waf_logs(page, limit, search, status, attack_type, time_range)
+    return log_service.get_waf_logs(page, limit, search, status, attack_type, time_range, cursor)
 
 @app.delete("/api/waf/rule", response_model=CommandResponse)
 def delete_rule(ip: str, user = Depends(auth_service.get_current_user)):
@@ -109,13 +154,17 @@ def delete_rule(ip: str, user = Depends(auth_service.get_current_user)):
 def restart_server(user = Depends(auth_service.get_current_user)):
     return system_service.restart_caddy()
 
+@app.get("/api/system/reload-status", response_model=ReloadStatus)
+def get_reload_status(user = Depends(auth_service.get_current_user)):
+    return system_service.get_reload_status()
+
 @app.get("/api/waf/custom")
 def get_custom_rules(user = Depends(auth_service.get_current_user)):
     return system_service.get_custom_rules()
 
 @app.get("/api/system/status", response_model=SystemHealth)
-def get_system_status(user = Depends(auth_service.get_current_user)):
-    return system_service.get_system_health()
+def get_system_status(history: int = 0, user = Depends(auth_service.get_current_user)):
+    return system_service.get_system_health(history)
 
 @app.post("/api/waf/custom", response_model=CommandResponse)
 def save_custom_rules(req: CustomRuleRequest, user = Depends(auth_service.get_current_user)):
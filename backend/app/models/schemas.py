@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 # --- Sub-models untuk Dashboard ---
 class TrafficPoint(BaseModel):
@@ -21,6 +21,8 @@ class StatsResponse(BaseModel):
     # Top Cards
     total_requests: int
     blocked_attacks: int
+    unique_clients: int = 0 # estimasi HyperLogLog (~1.6% error)
+    unique_attackers: int = 0
     avg_latency: str
     cpu_load: str
     
@@ -49,9 +51,11 @@ class ActiveIp(BaseModel):
     ip: str
     country: str
     request_count: int
+    count_error: int = 0 # request_count bisa lebih tinggi dari nilai asli paling banyak sebesar ini
     attack_count: int
     last_seen: str
     rule_status: str # 'None', 'Blocked', 'Allowed'
+    matched_rule: Optional[str] = None # IP/CIDR dari rule yang cocok (longest prefix)
 
 class CommandResponse(BaseModel):
     status: str
@@ -82,14 +86,50 @@ class ServiceStatus(BaseModel):
     cpu: str
     uptime: str
 
+class MetricsPoint(BaseModel):
+    ts: float
+    cpu: float
+    ram: float
+    disk: float
+    load: float
+    net_in: float # Mbps
+    net_out: float
+    established: int = 0 # koneksi TCP
+    syn_recv: int = 0
+
+class InterfaceRate(BaseModel):
+    name: str
+    rx_bytes_s: float
+    tx_bytes_s: float
+    rx_packets_s: float
+    tx_packets_s: float
+
 class SystemHealth(BaseModel):
     uptime: str
     ram_usage: dict # {"used": 8.4, "total": 16, "percent": 52.5}
-    cpu_usage: int
+    cpu_usage: float
     disk_usage: dict # {"used_percent": 85, "path": "/var/log"}
     load_avg: float
-    network: dict # {"in": 120, "out": 50}
+    network: dict # {"in": 12.5, "out": 3.1} Mbps, semua interface kecuali loopback
+    interfaces: List[InterfaceRate] = []
+    tcp_states: Dict[str, int] = {} # {"ESTABLISHED": 120, "SYN_RECV": 3, ...}
     services: List[ServiceStatus]
+    history: Optional[List[MetricsPoint]] = None # hanya jika ?history=<detik>
+
+class ReloadStatus(BaseModel):
+    pending: bool # ada perubahan yang belum di-reload
+    running: bool
+    requests: int
+    reloads: int
+    coalesced: int # request yang tergabung ke reload lain
+    failures: int
+    last_status: str # 'success', 'error', 'warning', 'none'
+    last_message: str
+    last_reload_at: Optional[float] = None
+    last_duration_ms: float
+    avg_duration_ms: float
+    max_duration_ms: float
+    last_delay_ms: float # jeda dari perubahan pertama sampai reload
 
 class WafLogEntry(BaseModel):
     id: int
@@ -100,6 +140,7 @@ class WafLogEntry(BaseModel):
     attack_type: str # 'SQL Injection', 'XSS', 'Safe', etc.
     status_code: int
     country: str
+    rule_status: str = "None" # 'None', 'Blocked', 'Allowed'
 
 class WafLogListResponse(BaseModel):
     data: List[WafLogEntry]
@@ -107,6 +148,8 @@ class WafLogListResponse(BaseModel):
     page: int
     limit: int
     total_pages: int
+    next_cursor: Optional[str] = None # kirim balik sebagai ?cursor= untuk halaman berikutnya
+    total_is_estimate: bool = False # True jika total terpotong di LOG_COUNT_CAP
 
 class HotlinkConfig(BaseModel):
     extensions: List[str]
@@ -0,0 +1,126 @@
+import time
+import threading
+from collections import deque
+
+# Status yang dihitung sebagai serangan (sama dengan active IPs)
+ATTACK_STATUSES = (403, 401)
+
+
+class AutoBan:
+    """Bans IPs whose attack rate crosses a sliding-window threshold.
+
+    Subscribes to the log tailer next to the heavy-hitter counters. For
+    every attacking IP it keeps the timestamps of its last ``threshold``
+    blocked requests; when the oldest of them is within ``window_seconds``
+    of the newest, the IP is over the limit and becomes a candidate.
+
+    Hysteresis keeps one flood from turning into a write per request:
+    - candidates are collected and handed to ``ban_fn`` together at most
+      once every ``flush_seconds`` (a timer flushes the rest once the
+      flood stops), so a burst costs one transaction and one Caddy reload;
+    - a banned IP is ignored until ``cooldown_seconds`` (the ban
+      duration) have passed, even if its old log lines keep arriving.
+
+    If ``ban_fn`` fails the batch is retried at the next flush. At most
+    ``max_tracked`` IPs are counted; past that the least recently seen one
+    is dropped. Events older than the window (e.g. the startup backfill)
+    never count.
+    """
+
+    def __init__(self, ban_fn, threshold: int = 20, window_seconds: int = 60,
+                 cooldown_seconds: int = 3600, flush_seconds: float = 5.0, max_tracked: int = 100_000):
+        self.ban_fn = ban_fn
+        self.threshold = threshold
+        self.window_seconds = window_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.flush_seconds = flush_seconds
+        self.max_tracked = max_tracked
+        self.hits = {}
+        self.pending = set()
+        self.banned = {}
+        self.last_flush = 0.0
+        self.total_banned = 0
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def add_events(self, events):
+        """Tailer subscriber: count blocked requests per IP and flush bans."""
+        now = time.time()
+        cutoff = now - self.window_seconds
+        with self._lock:
+            hits = self.hits
+            for event in events:
+                ts = event["ts"]
+                if ts < cutoff or event["status"] not in ATTACK_STATUSES:
+                    continue
+                ip = event["ip"]
+                if ip in self.pending or self.banned.get(ip, 0) > now:
+                    continue
+                # Pindah ke akhir dict: urutan insert = urutan terakhir terlihat
+                window = hits.pop(ip, None)
+                if window is None:
+                    window = deque(maxlen=self.threshold)
+                    if len(hits) >= self.max_tracked:
+                        # Penuh: buang IP yang paling lama tidak terlihat
+                        del hits[next(iter(hits))]
+                hits[ip] = window
+                window.append(ts)
+                if len(window) == self.threshold and ts - window[0] <= self.window_seconds:
+                    self.pending.add(ip)
+                    del hits[ip]
+
+            if not self.pending:
+                return
+            wait = self.last_flush + self.flush_seconds - now
+            if wait > 0:
+                # Terlalu cepat sejak flush terakhir: tunda, sisa kandidat ikut batch berikutnya
+                self._schedule_flush(wait)
+                return
+        self.flush()
+
+    def flush(self):
+        """Ban every pending candidate in one call to ``ban_fn``."""
+        with self._lock:
+            self._timer = None
+            if not self.pending:
+                return
+            batch = sorted(self.pending)
+            self.pending = set()
+            self.last_flush = time.time()
+
+        try:
+            banned = self.ban_fn(batch)
+        except Exception as e:
+            print(f"Error applying auto-ban: {e}")
+            with self._lock:
+                # Coba lagi di flush berikutnya
+                self.pending.update(batch)
+                self._schedule_flush(self.flush_seconds)
+            return
+
+        with self._lock:
+            self.total_banned += banned
+            now = time.time()
+            self.banned = {ip: until for ip, until in self.banned.items() if until > now}
+            # IP yang dilewati ban_fn (allow/sudah diblok) juga didiamkan selama cooldown
+            until = now + self.cooldown_seconds
+            for ip in batch:
+                self.banned[ip] = until
+
+    def _schedule_flush(self, delay: float):
+        if self._timer is None:
+            self._timer = threading.Timer(delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+
+def recent_attacks(events, window_seconds: int):
+    """The blocked requests of a batch still inside the window, trimmed to the
+    fields AutoBan uses. Runs in the parse workers of a parallel backfill;
+    AutoBan.add_events takes the result as its merge."""
+    cutoff = time.time() - window_seconds
+    return [
+        {"ts": e["ts"], "ip": e["ip"], "status": e["status"]}
+        for e in events
+        if e["ts"] >= cutoff and e["status"] in ATTACK_STATUSES
+    ]
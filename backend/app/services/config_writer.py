@@ -0,0 +1,111 @@
+import os
+import hashlib
+import tempfile
+import threading
+
+# path -> (mtime_ns, size, hash) dari tulisan terakhir; file dibaca ulang
+# hanya jika stat-nya berubah (misal diedit manual)
+_hashes = {}
+_lock = threading.Lock()
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _file_hash(path: str):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    cached = _hashes.get(path)
+    if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _remember(path: str, digest: str):
+    st = os.stat(path)
+    _hashes[path] = (st.st_mtime_ns, st.st_size, digest)
+
+
+def write_config(path: str, content: str) -> bool:
+    """Atomically replace ``path`` with ``content`` if it differs.
+
+    Returns False (and leaves the file alone) when the file already holds
+    exactly this content, so callers can skip the Caddy reload. Otherwise
+    the content goes to a temp file in the same directory, is fsynced and
+    renamed over ``path``: a reader sees either the old or the new file,
+    never a half-written one. The replacement keeps the old file's mode,
+    owner and group.
+
+    The rename needs write access to the directory (e.g. /etc/caddy), not
+    just to the file. Without it, or when the old owner/group cannot be
+    restored, the file is rewritten in place instead (not atomic, but the
+    inode and its ownership stay as they were); if that fails too a
+    PermissionError says which access is missing.
+    """
+    digest = content_hash(content)
+    with _lock:
+        if _file_hash(path) == digest:
+            _remember(path, digest)
+            return False
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            st = None
+
+        try:
+            _replace(path, directory, content, st)
+        except PermissionError as e:
+            if st is None:
+                raise PermissionError(f"Cannot create {path}: no write access to {directory}") from e
+            print(f"Atomic write of {path} not permitted ({e}); rewriting it in place")
+            _write_in_place(path, content)
+
+        _remember(path, digest)
+        return True
+
+
+def _replace(path: str, directory: str, content: str, st):
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, st.st_mode & 0o777 if st else 0o644)
+        if st is not None and os.name != "nt":
+            # File baru milik user backend: kembalikan owner/group lama supaya Caddy tetap bisa baca
+            tmp_st = os.stat(tmp_path)
+            if (tmp_st.st_uid, tmp_st.st_gid) != (st.st_uid, st.st_gid):
+                os.chown(tmp_path, st.st_uid, st.st_gid)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    if os.name != "nt":
+        # Rename baru tahan crash setelah direktorinya ikut di-fsync
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def _write_in_place(path: str, content: str):
+    try:
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+    except PermissionError as e:
+        raise PermissionError(f"Cannot write {path}: the backend needs write access to the file (or to its directory for atomic replace)") from e
@@ -0,0 +1,186 @@
+import json
+import time
+import socket
+import threading
+import ipaddress
+from app.db import get_db_connection
+
+CHECKPOINT_KEY = "waf_events_checkpoint"
+PRUNE_INTERVAL = 600 # detik
+
+INSERT_SQL = (
+    "INSERT INTO waf_events (ts, ip, method, path, status, attack_type, country, user_agent, ip_key) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+# Index FTS diisi per batch (bukan trigger per baris) supaya ingest tetap cepat
+FTS_INSERT_SQL = (
+    "INSERT INTO waf_events_fts (rowid, ip, path, user_agent, attack_type) "
+    "SELECT id, ip, path, user_agent, attack_type FROM waf_events WHERE id > ?"
+)
+FTS_DELETE_SQL = (
+    "INSERT INTO waf_events_fts (waf_events_fts, rowid, ip, path, user_agent, attack_type) "
+    "SELECT 'delete', id, ip, path, user_agent, attack_type FROM waf_events WHERE ts < ?"
+)
+
+# Trigram FTS butuh minimal 3 karakter
+MIN_FTS_QUERY = 3
+
+
+V4_MAPPED_PREFIX = b"\x00" * 10 + b"\xff\xff"
+
+
+def ip_key(address) -> bytes:
+    """16-byte sortable key of an IP; IPv4 is mapped to ::ffff:a.b.c.d"""
+    if isinstance(address, str):
+        # inet_pton jauh lebih cepat dari ipaddress.ip_address untuk ingest
+        try:
+            return V4_MAPPED_PREFIX + socket.inet_pton(socket.AF_INET, address)
+        except OSError:
+            pass
+        try:
+            address = ipaddress.ip_address(address)
+        except ValueError:
+            return None
+    if address.version == 4:
+        return V4_MAPPED_PREFIX + address.packed
+    return address.packed
+
+
+def parse_ip_search(text: str):
+    """Network for an IP search term, or None for plain text.
+
+    Accepts CIDR notation ("10.0.0.0/8", "2001:db8::/32") and IPv4 prefixes
+    made of whole octets ("192.168.").
+    """
+    text = text.strip()
+    try:
+        if "/" in text:
+            return ipaddress.ip_network(text, strict=False)
+        if text.endswith(".") and text[:-1].replace(".", "").isdigit():
+            octets = text[:-1].split(".")
+            if len(octets) < 4:
+                padded = ".".join(octets + ["0"] * (4 - len(octets)))
+                return ipaddress.ip_network(f"{padded}/{8 * len(octets)}")
+    except ValueError:
+        pass
+    return None
+
+
+def event_rows(events):
+    """``(file_id, [(offset, row), ...])`` of a batch, rows ready for INSERT_SQL.
+
+    Pure function, so a parallel backfill can build the rows (ip_key
+    included) inside the parse workers and hand only them to
+    EventStore.insert.
+    """
+    if not events:
+        return None, []
+    return events[0]["file_id"], [
+        (e["offset"], (e["ts"], e["ip"], e["method"], e["path"], e["status"], e["attack_type"], e["country"], e["user_agent"], ip_key(e["ip"])))
+        for e in events
+    ]
+
+
+class EventStore:
+    """Persists tailed log events into the ``waf_events`` table.
+
+    Registered as a LogTailer subscriber. The byte position of the last
+    stored line is saved in ``settings`` in the same transaction as the rows,
+    so after a restart the tailer's replay of the file is not inserted twice.
+    Rows older than ``retention_seconds`` are pruned periodically.
+    """
+
+    def __init__(self, retention_seconds: int = 30 * 86400):
+        self.retention_seconds = retention_seconds
+        self._checkpoint = self._load_checkpoint()
+        self.fts_enabled = self._has_fts()
+        self._last_prune = 0
+        self._lock = threading.Lock()
+
+    def _has_fts(self) -> bool:
+        with get_db_connection() as conn:
+            return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'waf_events_fts'").fetchone() is not None
+
+    def search_clause(self, search: str):
+        """SQL condition and params for the Logs Explorer search box.
+
+        CIDR/IP-prefix terms become a range on the ip_key index, text of 3+
+        characters a substring match on the trigram index (ip, path, user
+        agent, attack type). Short terms and builds without FTS5 use LIKE.
+        """
+        network = parse_ip_search(search)
+        if network is not None:
+            return "ip_key BETWEEN ? AND ?", [ip_key(network.network_address), ip_key(network.broadcast_address)]
+
+        if self.fts_enabled and len(search) >= MIN_FTS_QUERY:
+            phrase = '"' + search.replace('"', '""') + '"'
+            return "id IN (SELECT rowid FROM waf_events_fts WHERE waf_events_fts MATCH ?)", [phrase]
+
+        s = f"%{search.lower()}%"
+        return "(lower(ip) LIKE ? OR lower(path) LIKE ? OR lower(user_agent) LIKE ? OR lower(attack_type) LIKE ?)", [s, s, s, s]
+
+    def _load_checkpoint(self):
+        try:
+            with get_db_connection() as conn:
+                row = conn.execute("SELECT value FROM settings WHERE key = ?", (CHECKPOINT_KEY,)).fetchone()
+            if row:
+                data = json.loads(row['value'])
+                return (tuple(data["file_id"]), data["offset"])
+        except Exception as e:
+            print(f"Error loading event checkpoint: {e}")
+        return None
+
+    def _is_replayed(self, file_id, offset) -> bool:
+        """True if the line at ``offset`` was already stored before a restart."""
+        if self._checkpoint is None:
+            return False
+        checkpoint_file, checkpoint_offset = self._checkpoint
+        if tuple(file_id) != checkpoint_file:
+            return False
+        if offset < checkpoint_offset:
+            return True
+        # Sudah lewat titik checkpoint, tidak perlu dicek lagi
+        self._checkpoint = None
+        return False
+
+    def add_events(self, events):
+        """Tailer subscriber: insert a batch of parsed events in one transaction."""
+        self.insert(event_rows(events))
+
+    def insert(self, partial):
+        """Insert the rows built by event_rows, with the checkpoint, in one transaction."""
+        file_id, lines = partial
+        if not lines:
+            return
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            rows = [row for offset, row in lines if row[0] >= cutoff and not self._is_replayed(file_id, offset)]
+            if not rows:
+                return
+
+            checkpoint = json.dumps({"file_id": list(file_id), "offset": lines[-1][0] + 1})
+
+            with get_db_connection() as conn:
+                last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM waf_events").fetchone()[0]
+                conn.executemany(INSERT_SQL, rows)
+                if self.fts_enabled:
+                    conn.execute(FTS_INSERT_SQL, (last_id,))
+                conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (CHECKPOINT_KEY, checkpoint))
+                conn.commit()
+
+            now = time.time()
+            if now - self._last_prune >= PRUNE_INTERVAL:
+                self.prune(now)
+
+    def prune(self, now: float = None):
+        """Delete rows older than the retention window."""
+        now = now or time.time()
+        self._last_prune = now
+        cutoff = now - self.retention_seconds
+        with get_db_connection() as conn:
+            if self.fts_enabled:
+                conn.execute(FTS_DELETE_SQL, (cutoff,))
+            cur = conn.execute("DELETE FROM waf_events WHERE ts < ?", (cutoff,))
+            conn.commit()
+        return cur.rowcount
@@ -0,0 +1,180 @@
+import os
+import csv
+import socket
+import ipaddress
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from app.core.config import get_settings
+
+settings = get_settings()
+
+UNKNOWN = "Unknown"
+
+
+def ip_to_int(ip: str):
+    """(version, integer value) of an address, or None if invalid."""
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big")
+    except OSError:
+        pass
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return None
+    if address.version == 6 and address.ipv4_mapped:
+        return 4, int(address.ipv4_mapped)
+    return address.version, int(address)
+
+
+class GeoIpDatabase:
+    """Offline IP -> country resolver over a sorted array of ranges.
+
+    Loads one of, from local disk only:
+    - a range CSV ``start,end,country[,...]`` with addresses as text or
+      integers (DB-IP lite, IP2Location LITE DB1),
+    - MaxMind GeoLite2 Country CSV (``*-Blocks-IPv4.csv``; the IPv6 blocks
+      and ``*-Locations-en.csv`` files are read from the same directory),
+    - a MaxMind ``.mmdb`` file, if the optional ``maxminddb`` package is
+      installed.
+
+    Range starts are kept sorted (IPv4 in a compact ``array`` with a /16
+    block index to narrow the search) and looked up with bisect, behind an
+    LRU cache of ``cache_size`` hot addresses.
+    """
+
+    def __init__(self, path: str = "", cache_size: int = 65536):
+        self.path = path
+        self.ranges = {4: (array("I"), array("I"), []), 6: ([], [], [])}
+        self.reader = None
+        self.v4_blocks = None
+        if path:
+            try:
+                self._load(path)
+            except Exception as e:
+                print(f"Error loading GeoIP database {path}: {e}")
+        self.country = lru_cache(maxsize=cache_size)(self._country)
+
+    # --- Loading ---
+
+    def _load(self, path):
+        if path.endswith(".mmdb"):
+            try:
+                import maxminddb
+            except ImportError:
+                print("GeoIP: install 'maxminddb' to read .mmdb files, country lookup disabled.")
+                return
+            self.reader = maxminddb.open_database(path)
+            return
+
+        with open(path, newline="", encoding="utf-8") as f:
+            header = f.readline()
+        if header.startswith("network,"):
+            rows = self._read_geolite2(path)
+        else:
+            rows = self._read_ranges(path)
+
+        for version, items in rows.items():
+            items.sort()
+            starts, ends, codes = self.ranges[version]
+            for start, end, code in items:
+                starts.append(start)
+                ends.append(end)
+                codes.append(code)
+
+        # Index per /16: bisect hanya di antara range yang mulai di blok /16 yang sama
+        starts = self.ranges[4][0]
+        self.v4_blocks = array("I", (bisect_left(starts, block << 16) for block in range(65537)))
+        print(f"GeoIP: loaded {len(self.ranges[4][0])} IPv4 and {len(self.ranges[6][0])} IPv6 ranges from {path}")
+
+    def _read_ranges(self, path):
+        rows = {4: [], 6: []}
+        # Kode negara dipakai ulang (intern) supaya hemat memori
+        codes = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for rec in csv.reader(f):
+                if len(rec) < 3:
+                    continue
+                first, last = self._bound(rec[0]), self._bound(rec[1])
+                if first is None or last is None:
+                    # Header atau baris rusak
+                    continue
+                code = rec[2].strip().upper()
+                if code in ("", "-", "ZZ"):
+                    continue
+                version = first[0]
+                rows[version].append((first[1], last[1], codes.setdefault(code, code)))
+        return rows
+
+    @staticmethod
+    def _bound(value: str):
+        value = value.strip()
+        if value.isdigit():
+            # IP2Location: IPv4 sebagai integer (IPv6 punya file sendiri)
+            n = int(value)
+            return (4, n) if n < 1 << 32 else (6, n)
+        return ip_to_int(value)
+
+    def _read_geolite2(self, path):
+        directory = os.path.dirname(path)
+        prefix = os.path.basename(path).split("-Blocks-")[0]
+        countries = {}
+        locations = os.path.join(directory, f"{prefix}-Locations-en.csv")
+        with open(locations, newline="", encoding="utf-8") as f:
+            for rec in csv.DictReader(f):
+                if rec.get("country_iso_code"):
+                    countries[rec["geoname_id"]] = rec["country_iso_code"]
+
+        rows = {4: [], 6: []}
+        for family in ("IPv4", "IPv6"):
+            blocks = os.path.join(directory, f"{prefix}-Blocks-{family}.csv")
+            if not os.path.exists(blocks):
+                continue
+            with open(blocks, newline="", encoding="utf-8") as f:
+                for rec in csv.DictReader(f):
+                    code = countries.get(rec["geoname_id"] or rec["registered_country_geoname_id"])
+                    if not code:
+                        continue
+                    network = ipaddress.ip_network(rec["network"])
+                    rows[network.version].append((int(network.network_address), int(network.broadcast_address), code))
+        return rows
+
+    # --- Lookup ---
+
+    def _country(self, ip: str) -> str:
+        if self.reader is not None:
+            try:
+                record = self.reader.get(ip) or {}
+            except ValueError:
+                return UNKNOWN
+            return (record.get("country") or record.get("registered_country") or {}).get("iso_code", UNKNOWN)
+
+        key = ip_to_int(ip)
+        if key is None:
+            return UNKNOWN
+        version, n = key
+        starts, ends, codes = self.ranges[version]
+        if version == 4 and self.v4_blocks is not None:
+            block = n >> 16
+            i = bisect_right(starts, n, self.v4_blocks[block], self.v4_blocks[block + 1]) - 1
+        else:
+            i = bisect_right(starts, n) - 1
+        if i >= 0 and n <= ends[i]:
+            return codes[i]
+        return UNKNOWN
+
+    def region(self, network: str) -> str:
+        """Region label for an IP rule (address or CIDR)."""
+        try:
+            net = ipaddress.ip_network(network.strip(), strict=False)
+        except ValueError:
+            return UNKNOWN
+        if net.is_private or net.is_loopback:
+            return "Local"
+        return self.country(str(net.network_address))
+
+
+@lru_cache()
+def get_geoip() -> GeoIpDatabase:
+    """Shared resolver for GEOIP_DB_PATH (one per process)"""
+    return GeoIpDatabase(settings.GEOIP_DB_PATH, cache_size=settings.GEOIP_CACHE_SIZE)
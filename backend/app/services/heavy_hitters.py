@@ -0,0 +1,187 @@
+import time
+import heapq
+import threading
+
+# Index field di setiap counter
+COUNT, ERROR, ATTACKS, LAST_SEEN = range(4)
+
+
+class SpaceSaving:
+    """Space-Saving top-k summary with a fixed number of counters.
+
+    Every tracked key has ``[count, error, attacks, last_seen]``. When all
+    ``capacity`` counters are taken, a new key replaces the one with the
+    smallest count and inherits that count as its error. The true count of
+    a key lies in ``[count - error, count]``, and any key not tracked has
+    a count of at most ``min_count()`` (at most ``total / capacity``).
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counters = {}
+        self.total = 0
+        # Min-heap (count, key) dengan entry basi; dibersihkan saat evict
+        self._heap = []
+
+    def add(self, key, ts: float, attack: bool):
+        self.total += 1
+        counter = self.counters.get(key)
+        if counter is None:
+            if len(self.counters) < self.capacity:
+                counter = self.counters[key] = [0, 0, 0, ts]
+            else:
+                floor = self._evict()
+                counter = self.counters[key] = [floor, floor, 0, ts]
+            heapq.heappush(self._heap, (counter[COUNT] + 1, key))
+
+        counter[COUNT] += 1
+        if attack:
+            counter[ATTACKS] += 1
+        if ts > counter[LAST_SEEN]:
+            counter[LAST_SEEN] = ts
+
+    def _evict(self) -> int:
+        """Remove the key with the smallest count and return that count."""
+        heap = self._heap
+        while True:
+            count, key = heapq.heappop(heap)
+            counter = self.counters.get(key)
+            if counter is None:
+                continue
+            if counter[COUNT] != count:
+                # Basi: count sudah naik sejak entry ini dibuat
+                heapq.heappush(heap, (counter[COUNT], key))
+                continue
+            del self.counters[key]
+            return count
+
+    def merge(self, other: "SpaceSaving"):
+        """Fold another summary of the same capacity into this one.
+
+        A key missing from one side may have had up to that side's
+        ``min_count()`` hits there, so it is added to both count and error;
+        then only the ``capacity`` largest counters are kept. The error
+        bounds of both summaries still hold for the result.
+        """
+        floor_self = self.min_count()
+        floor_other = other.min_count()
+        merged = {}
+        for key, c in self.counters.items():
+            o = other.counters.get(key)
+            if o is None:
+                merged[key] = [c[COUNT] + floor_other, c[ERROR] + floor_other, c[ATTACKS], c[LAST_SEEN]]
+            else:
+                merged[key] = [c[COUNT] + o[COUNT], c[ERROR] + o[ERROR], c[ATTACKS] + o[ATTACKS], max(c[LAST_SEEN], o[LAST_SEEN])]
+        for key, o in other.counters.items():
+            if key not in merged:
+                merged[key] = [o[COUNT] + floor_self, o[ERROR] + floor_self, o[ATTACKS], o[LAST_SEEN]]
+
+        if len(merged) > self.capacity:
+            merged = dict(heapq.nlargest(self.capacity, merged.items(), key=lambda kv: kv[1][COUNT]))
+        self.counters = merged
+        self.total += other.total
+        self._heap = [(c[COUNT], key) for key, c in merged.items()]
+        heapq.heapify(self._heap)
+
+    def min_count(self) -> int:
+        """Upper bound on the count of any key that is not tracked."""
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(c[COUNT] for c in self.counters.values())
+
+
+class HeavyHitters:
+    """Sliding-window top talkers, updated at ingest with bounded memory.
+
+    Events are counted into one SpaceSaving summary per ``slice_seconds``
+    time slice. Summaries older than ``window_seconds`` are dropped. A query
+    merges the slices covering the requested window. A key missing from a
+    slice may still have up to that slice's ``min_count()`` hits there, and
+    this is added to both its count and its error. Memory is at most
+    ``capacity`` counters per slice, however many distinct IPs arrive.
+    """
+
+    def __init__(self, capacity: int = 1000, window_seconds: int = 3600, slice_seconds: int = 300):
+        self.capacity = capacity
+        self.window_seconds = window_seconds
+        self.slice_seconds = slice_seconds
+        self.slices = {}
+        self._lock = threading.Lock()
+
+    def add_events(self, events):
+        """Tailer subscriber: count a batch of parsed events."""
+        cutoff = time.time() - self.window_seconds - self.slice_seconds
+        with self._lock:
+            for event in events:
+                ts = event["ts"]
+                if ts < cutoff:
+                    continue
+                key = int(ts) - int(ts) % self.slice_seconds
+                summary = self.slices.get(key)
+                if summary is None:
+                    summary = self.slices[key] = SpaceSaving(self.capacity)
+                summary.add(event["ip"], ts, event["status"] in (403, 401))
+
+            for key in [k for k in self.slices if k < cutoff - self.slice_seconds]:
+                del self.slices[key]
+
+    def merge(self, slices):
+        """Add the per-slice summaries produced by count_heavy_hitters."""
+        cutoff = time.time() - self.window_seconds - self.slice_seconds
+        with self._lock:
+            for key, summary in slices.items():
+                if key < cutoff - self.slice_seconds:
+                    continue
+                target = self.slices.get(key)
+                if target is None:
+                    self.slices[key] = summary
+                else:
+                    target.merge(summary)
+
+    def top(self, k: int, window_seconds: int = None):
+        """Top ``k`` keys of the window as ``(key, count, error, attacks, last_seen)``.
+
+        The window is rounded out to whole slices.
+        """
+        window_seconds = window_seconds or self.window_seconds
+        start = time.time() - window_seconds
+        start -= start % self.slice_seconds
+
+        with self._lock:
+            merged = {}
+            total_floor = 0
+            for key, summary in self.slices.items():
+                if key < start:
+                    continue
+                floor = summary.min_count()
+                total_floor += floor
+                for ip, c in summary.counters.items():
+                    m = merged.get(ip)
+                    if m is None:
+                        merged[ip] = [c[COUNT], c[ERROR], c[ATTACKS], c[LAST_SEEN], floor]
+                    else:
+                        m[0] += c[COUNT]
+                        m[1] += c[ERROR]
+                        m[2] += c[ATTACKS]
+                        if c[LAST_SEEN] > m[3]:
+                            m[3] = c[LAST_SEEN]
+                        m[4] += floor
+
+        result = []
+        for ip, (count, error, attacks, last_seen, floors) in merged.items():
+            # Slice yang tidak melacak ip ini bisa menyimpan sampai min_count() hit
+            missing = total_floor - floors
+            result.append((ip, count + missing, error + missing, attacks, last_seen))
+
+        return heapq.nlargest(k, result, key=lambda r: r[1])
+
+
+def count_heavy_hitters(events, capacity: int, window_seconds: int, slice_seconds: int):
+    """Per-slice summaries of a batch of parsed events.
+
+    Pure function, so a parallel backfill can run it inside the parse
+    workers and hand the result to HeavyHitters.merge.
+    """
+    counter = HeavyHitters(capacity, window_seconds, slice_seconds)
+    counter.add_events(events)
+    return counter.slices
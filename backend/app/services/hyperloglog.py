@@ -0,0 +1,89 @@
+import math
+from hashlib import blake2b
+
+# 2^12 register -> standard error ~1.6%
+PRECISION = 12
+NUM_REGISTERS = 1 << PRECISION
+RANK_BITS = 64 - PRECISION
+RANK_MASK = (1 << RANK_BITS) - 1
+ALPHA = 0.7213 / (1 + 1.079 / NUM_REGISTERS)
+
+# Sketch kecil disimpan sparse (dict index -> rank), jadi dense di atas batas ini
+SPARSE_MAX = NUM_REGISTERS // 32
+
+# 2^-rank untuk estimator
+INV_POW2 = [2.0 ** -r for r in range(RANK_BITS + 2)]
+
+
+def hash_key(key: str) -> int:
+    """Stable 64-bit hash (same in every process, unlike hash())."""
+    return int.from_bytes(blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter with a sparse form for small sets.
+
+    Starts as a dict of the registers that are set and switches to a dense
+    ``bytearray`` of 4096 registers once it holds more than ``SPARSE_MAX``,
+    so the many per-minute sketches of a quiet site stay small. Sketches
+    merge by register-wise max, so the union of any set of buckets can be
+    estimated without keeping the keys.
+    """
+
+    def __init__(self):
+        self.sparse = {}
+        self.registers = None
+
+    def add_hash(self, h: int):
+        idx = h >> RANK_BITS
+        rank = RANK_BITS - (h & RANK_MASK).bit_length() + 1
+        registers = self.registers
+        if registers is not None:
+            if rank > registers[idx]:
+                registers[idx] = rank
+        elif rank > self.sparse.get(idx, 0):
+            self.sparse[idx] = rank
+            if len(self.sparse) > SPARSE_MAX:
+                self._densify()
+
+    def add(self, key: str):
+        self.add_hash(hash_key(key))
+
+    def _densify(self):
+        registers = bytearray(NUM_REGISTERS)
+        for idx, rank in self.sparse.items():
+            registers[idx] = rank
+        self.registers = registers
+        self.sparse = {}
+
+    def merge(self, other: "HyperLogLog"):
+        """In-place union with ``other``."""
+        if other.registers is None:
+            for idx, rank in other.sparse.items():
+                if self.registers is not None:
+                    if rank > self.registers[idx]:
+                        self.registers[idx] = rank
+                elif rank > self.sparse.get(idx, 0):
+                    self.sparse[idx] = rank
+            if self.registers is None and len(self.sparse) > SPARSE_MAX:
+                self._densify()
+            return
+
+        if self.registers is None:
+            self._densify()
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        """Estimated number of distinct keys added."""
+        if self.registers is None:
+            zeros = NUM_REGISTERS - len(self.sparse)
+            z = zeros + sum(INV_POW2[r] for r in self.sparse.values())
+        else:
+            zeros = self.registers.count(0)
+            z = sum(INV_POW2[r] for r in self.registers)
+
+        estimate = ALPHA * NUM_REGISTERS * NUM_REGISTERS / z
+        if estimate <= 2.5 * NUM_REGISTERS and zeros:
+            # Small range: linear counting is more accurate
+            estimate = NUM_REGISTERS * math.log(NUM_REGISTERS / zeros)
+        return int(round(estimate))
@@ -0,0 +1,208 @@
+import struct
+import threading
+from bisect import bisect_left
+
+# Format file .tidx: MAGIC + (st_dev, st_ino) file log + record (ts, offset) berurutan
+MAGIC = b"WAFTIDX1"
+HEADER = struct.Struct("<QQ")
+RECORD = struct.Struct("<dQ")
+
+
+class LogTimeIndex:
+    """Sparse on-disk index from timestamps to byte offsets in the access log.
+
+    Fed by the LogTailer as a subscriber: every ``stride_lines`` lines, or
+    when the clock moves ``stride_seconds`` past the previous entry, it
+    records ``(ts, offset)`` where ``ts`` is the newest timestamp of any line
+    *before* ``offset``. Entries are therefore sorted even if the log has
+    slightly out-of-order lines, and every line before the offset returned by
+    ``seek(start_ts)`` is older than ``start_ts``.
+
+    Entries are appended to a sidecar file (``<log>.tidx`` by default) so the
+    index survives restarts. It is tied to the log's inode: after rotation or
+    truncation it is discarded and rebuilt from the new file.
+    """
+
+    def __init__(self, path: str, stride_lines: int = 1000, stride_seconds: int = 60):
+        self.path = path
+        self.stride_lines = stride_lines
+        self.stride_seconds = stride_seconds
+
+        self.file_id = None
+        self.times = []
+        self.offsets = []
+
+        self._lines = 0
+        self._max_ts = 0.0
+        self._fh = None
+        self._lock = threading.Lock()
+        self._load()
+
+    # --- Persistence ---
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            print(f"Error reading log index {self.path}: {e}")
+            return
+
+        if not data.startswith(MAGIC) or len(data) < len(MAGIC) + HEADER.size:
+            print(f"Ignoring invalid log index {self.path}")
+            return
+        self.file_id = HEADER.unpack_from(data, len(MAGIC))
+
+        pos = len(MAGIC) + HEADER.size
+        # Record terakhir bisa terpotong kalau proses mati saat menulis
+        end = pos + (len(data) - pos) // RECORD.size * RECORD.size
+        for ts, offset in RECORD.iter_unpack(data[pos:end]):
+            self.times.append(ts)
+            self.offsets.append(offset)
+        if self.times:
+            self._max_ts = self.times[-1]
+
+    def _reset(self, file_id):
+        """Start a new index for the log file identified by ``file_id``."""
+        self.file_id = tuple(file_id)
+        self.times = []
+        self.offsets = []
+        self._lines = 0
+        self._max_ts = 0.0
+        if self._fh:
+            self._fh.close()
+            self._fh = None
+        try:
+            self._fh = open(self.path, "wb")
+            self._fh.write(MAGIC + HEADER.pack(*self.file_id))
+            self._fh.flush()
+        except OSError as e:
+            # Log dir read-only: index tetap jalan di memori saja
+            print(f"Error writing log index {self.path}: {e}")
+            self._fh = None
+
+    def _append(self, records):
+        if self._fh is None:
+            return
+        try:
+            self._fh.write(b"".join(RECORD.pack(ts, offset) for ts, offset in records))
+            self._fh.flush()
+        except OSError as e:
+            print(f"Error writing log index {self.path}: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._fh:
+                self._fh.close()
+                self._fh = None
+
+    # --- Building ---
+
+    def add_events(self, events):
+        """Tailer subscriber: extend the index with a batch of parsed events."""
+        with self._lock:
+            file_id = tuple(events[0]["file_id"])
+            if file_id != self.file_id:
+                # Rotated: the old entries point into another file
+                self._reset(file_id)
+            elif self._fh is None:
+                self._reopen()
+
+            last_offset = self.offsets[-1] if self.offsets else -1
+            records = []
+            for e in events:
+                offset = e["offset"]
+                if offset <= last_offset:
+                    # Replay after a restart: already indexed
+                    continue
+                if not self.offsets or self._lines >= self.stride_lines or e["ts"] - self.times[-1] >= self.stride_seconds:
+                    ts = self._max_ts if self.offsets else 0.0
+                    self.times.append(ts)
+                    self.offsets.append(offset)
+                    records.append((ts, offset))
+                    last_offset = offset
+                    self._lines = 0
+                self._lines += 1
+                if e["ts"] > self._max_ts:
+                    self._max_ts = e["ts"]
+
+            self._append(records)
+
+    def merge(self, partial):
+        """Extend the index with the points built by index_points for the next chunk."""
+        if partial is None:
+            return
+        with self._lock:
+            file_id = tuple(partial["file_id"])
+            if file_id != self.file_id:
+                self._reset(file_id)
+            elif self._fh is None:
+                self._reopen()
+
+            last_offset = self.offsets[-1] if self.offsets else -1
+            records = []
+            for offset, chunk_max_ts in partial["points"]:
+                if offset <= last_offset:
+                    continue
+                # Newest ts before this offset: earlier chunks plus this chunk's lines so far
+                ts = max(self._max_ts, chunk_max_ts) if self.offsets else 0.0
+                self.times.append(ts)
+                self.offsets.append(offset)
+                records.append((ts, offset))
+                last_offset = offset
+            self._lines = partial["lines"] if records else self._lines + partial["lines"]
+            if partial["max_ts"] > self._max_ts:
+                self._max_ts = partial["max_ts"]
+
+            self._append(records)
+
+    def reset(self, file_id):
+        """Drop all entries, e.g. after the log was truncated in place."""
+        with self._lock:
+            self._reset(file_id)
+
+    def _reopen(self):
+        try:
+            self._fh = open(self.path, "ab")
+        except OSError as e:
+            print(f"Error writing log index {self.path}: {e}")
+
+    # --- Lookup ---
+
+    def seek(self, file_id, start_ts: float, size: int):
+        """Byte offset in the log from which every line with ``ts >= start_ts`` follows.
+
+        Returns None if the index belongs to another file or points past
+        ``size``, i.e. the log was rotated or truncated since it was built.
+        """
+        with self._lock:
+            if tuple(file_id) != self.file_id or (self.offsets and self.offsets[-1] > size):
+                return None
+            i = bisect_left(self.times, start_ts) - 1
+            return self.offsets[i] if i >= 0 else 0
+
+
+def index_points(events, stride_lines: int, stride_seconds: int):
+    """Candidate index points of one chunk of a parallel backfill.
+
+    Runs in the parse workers. The stride restarts at the chunk's first
+    line, and each point carries the newest ts of the chunk's lines before
+    it; LogTimeIndex.merge combines that with the earlier chunks.
+    """
+    if not events:
+        return None
+    points = []
+    lines = 0
+    max_ts = 0.0
+    point_ts = None
+    for e in events:
+        if point_ts is None or lines >= stride_lines or e["ts"] - point_ts >= stride_seconds:
+            points.append((e["offset"], max_ts))
+            point_ts = max_ts or e["ts"]
+            lines = 0
+        lines += 1
+        if e["ts"] > max_ts:
+            max_ts = e["ts"]
+    return {"file_id": events[0]["file_id"], "points": points, "max_ts": max_ts, "lines": lines}
@@ -0,0 +1,61 @@
+import os
+import mmap
+
+# Halaman yang sudah dilewati dilepas tiap 64MB supaya RSS tidak ikut membesar
+RELEASE_SIZE = 64 * 1024 * 1024
+
+
+def iter_lines_forward(path: str, start: int = 0):
+    """Yields the lines of ``path`` from byte offset ``start`` to the end."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+
+    with f:
+        f.seek(start)
+        for line in f:
+            if not line.endswith(b"\n"):
+                # Baris terakhir masih ditulis
+                break
+            if line != b"\n":
+                yield line[:-1]
+
+
+def iter_lines_reverse(path: str, start: int = 0):
+    """Yields the complete lines of ``path`` from the last one backwards.
+
+    The file is memory-mapped and scanned with ``rfind`` from the end, so
+    only the pages holding the lines actually consumed are touched: reading
+    the newest N lines costs the same for a 10 KB and a 10 GB log. Pages
+    already scanned are released as it goes, so even a full backwards scan
+    keeps the resident set flat. Stops at
+    byte offset ``start`` (a line boundary, e.g. from LogTimeIndex.seek).
+    A trailing line without newline is still being written and is skipped.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= start:
+            return
+        # mmap tidak bisa untuk file kosong
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # pos = awal baris berikutnya (tepat setelah "\n")
+            pos = mm.rfind(b"\n", start, size) + 1
+            released = size
+            while pos > start:
+                if released - pos >= RELEASE_SIZE and hasattr(mm, "madvise"):
+                    # madvise butuh alamat yang rata ke halaman
+                    boundary = (pos // mmap.PAGESIZE + 1) * mmap.PAGESIZE
+                    mm.madvise(mmap.MADV_DONTNEED, boundary, released - boundary)
+                    released = boundary
+                nl = mm.rfind(b"\n", start, pos - 1)
+                line_start = nl + 1 if nl != -1 else start
+                line = mm[line_start:pos - 1]
+                if line:
+                    yield line
+                pos = line_start
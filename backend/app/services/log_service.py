@@ -1,17 +1,40 @@
 import os
 import time
+import json
+import base64
 import psutil
 import datetime
 import re
 import random
 import math
-from collections import deque, defaultdict
+import functools
+from collections import defaultdict
+from functools import lru_cache
 from app.core.config import get_settings
 from app.models.schemas import StatsResponse, AttackModule, TrafficPoint, WafLogEntry, WafLogListResponse
+from app.db import get_db_connection
 from app.services import system_service
+from app.services.event_store import EventStore, event_rows
+from app.services.log_tailer import LogTailer
+from app.services.log_index import LogTimeIndex
+from app.services.heavy_hitters import HeavyHitters, count_heavy_hitters
+from app.services.auto_ban import AutoBan, recent_attacks
+from app.services.rule_expiry import parse_duration
+from app.services.ip_matcher import RULE_STATUS
+from app.services.geoip import get_geoip
+from app.services.log_reader import iter_lines_forward, iter_lines_reverse
+from app.services.attack_classifier import classifier
+from app.services.rollup_store import RollupStore, ROLLUP_FIELDS, RESOLUTIONS, count_events
 
 settings = get_settings()
 
+# orjson (opsional) mempercepat decode log Caddy; tanpa itu pakai json bawaan
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 def generate_fake_trend(final_count: int, length: int = 7):
     if final_count == 0:
         return [0] * length
@@ -30,155 +53,222 @@ def parse_nginx_time(log_time_str):
     except Exception as e:
         return None
 
-def parse_caddy_time(ts):
+@lru_cache()
+def get_rollups() -> RollupStore:
+    """Per-minute traffic counters backing /api/stats"""
+    return RollupStore(
+        minute_retention=settings.ROLLUP_MINUTE_RETENTION_DAYS * 86400,
+        hour_retention=settings.ROLLUP_HOUR_RETENTION_DAYS * 86400,
+    )
+
+@lru_cache()
+def get_event_store() -> EventStore:
+    """Indexed waf_events table backing /api/logs"""
+    return EventStore(retention_seconds=settings.EVENT_RETENTION_DAYS * 86400)
+
+@lru_cache()
+def get_heavy_hitters() -> HeavyHitters:
+    """Sliding-window top talkers backing /api/waf/active-ips"""
+    return HeavyHitters(capacity=settings.ACTIVE_IP_COUNTERS, window_seconds=settings.ACTIVE_IP_WINDOW_MINUTES * 60)
+
+@lru_cache()
+def get_log_index() -> LogTimeIndex:
+    """Sparse timestamp -> byte offset index of ACCESS_LOG_PATH"""
+    return LogTimeIndex(
+        settings.LOG_INDEX_PATH or settings.ACCESS_LOG_PATH + ".tidx",
+        stride_lines=settings.LOG_INDEX_STRIDE_LINES,
+    )
+
+@lru_cache()
+def get_tailer() -> LogTailer:
+    """Shared incremental reader of ACCESS_LOG_PATH (one per process)"""
+    tailer = LogTailer(
+        settings.ACCESS_LOG_PATH,
+        parse_log_event,
+        retention_seconds=settings.LOG_RETENTION_DAYS * 86400,
+        index=get_log_index(),
+        workers=settings.LOG_PARSE_WORKERS or os.cpu_count() or 1,
+        parallel_min_bytes=settings.LOG_PARSE_PARALLEL_MIN_MB * 1024 * 1024,
+    )
+    rollups = get_rollups()
+    # Partial: dijalankan di worker saat backfill paralel, parent hanya merge hasilnya
+    tailer.subscribe(rollups.add_events, partial=count_events, merge=rollups.merge)
+    event_store = get_event_store()
+    tailer.subscribe(event_store.add_events, partial=event_rows, merge=event_store.insert)
+    heavy_hitters = get_heavy_hitters()
+    tailer.subscribe(
+        heavy_hitters.add_events,
+        partial=functools.partial(
+            count_heavy_hitters,
+            capacity=heavy_hitters.capacity,
+            window_seconds=heavy_hitters.window_seconds,
+            slice_seconds=heavy_hitters.slice_seconds,
+        ),
+        merge=heavy_hitters.merge,
+    )
+    if settings.AUTO_BAN_ENABLED:
+        auto_ban = get_auto_ban()
+        tailer.subscribe(
+            auto_ban.add_events,
+            partial=functools.partial(recent_attacks, window_seconds=auto_ban.window_seconds),
+            merge=auto_ban.add_events,
+        )
+    return tailer
+
+@lru_cache()
+def get_auto_ban() -> AutoBan:
+    """Rate-based auto-ban on the live log stream (AUTO_BAN_* settings)"""
+    note = f"Auto-ban: {settings.AUTO_BAN_THRESHOLD}+ blocked requests in {settings.AUTO_BAN_WINDOW_SECONDS}s"
+    return AutoBan(
+        lambda ips: system_service.auto_ban_ips(ips, note, settings.AUTO_BAN_DURATION),
+        threshold=settings.AUTO_BAN_THRESHOLD,
+        window_seconds=settings.AUTO_BAN_WINDOW_SECONDS,
+        cooldown_seconds=parse_duration(settings.AUTO_BAN_DURATION) or 86400,
+        flush_seconds=settings.AUTO_BAN_FLUSH_SECONDS,
+    )
+
+def parse_log_event(line: str):
+    """Parses one access log line (Caddy JSON or Nginx) into a normalized event dict.
+
+    Runs once per line when the tailer ingests it; every view reads the result.
+    """
     try:
-        if isinstance(ts, (int, float)):
-            return datetime.datetime.fromtimestamp(ts, tz=datetime.timezone.utc)
-        return None
-    except:
+        if line.lstrip().startswith("{"):
+            return parse_caddy_event(line)
+        return parse_nginx_event(line)
+    except Exception:
         return None
 
+def parse_caddy_event(line: str):
+    """Caddy JSON access log: decode once, read only the fields we use."""
+    data = json_loads(line)
+    ts = data.get('ts')
+    if not isinstance(ts, (int, float)): return None
+
+    req = data.get('request') or {}
+    ip_part = req.get('remote_ip', '-')
+    method = req.get('method', '-')
+    path = req.get('uri', '-')
+    status_code = data.get('status', 0)
+    user_agent = ((req.get('headers') or {}).get('User-Agent') or ['-'])[0]
+    is_blocked = 400 <= status_code < 500 # Simple heuristic
+
+    # Klasifikasi langsung dari field request, tanpa json.dumps ulang
+    category, attack_type = classifier.classify(f"{method} {path} {user_agent}", status_code)
+
+    return {
+        "ts": float(ts),
+        "ip": ip_part,
+        "method": method,
+        "path": path,
+        "status": status_code,
+        "blocked": is_blocked,
+        "category": category if is_blocked else None,
+        "attack_type": attack_type,
+        "country": get_country(ip_part),
+        "user_agent": user_agent,
+        "duration": data.get('duration'),
+    }
+
+def parse_nginx_event(line: str):
+    """Nginx combined log format: IP - - [TIMESTAMP] "REQUEST" STATUS ..."""
+    parts = line.split(' [')
+    if len(parts) < 2: return None
+
+    ip_part = line.split(' - -')[0].strip()
+    time_part_raw = parts[1].split(']')[0]
+    dt = parse_nginx_time(time_part_raw)
+    if not dt: return None
+
+    rest = parts[1].split(']')[1]
+    req_parts = rest.split('"')
+    if len(req_parts) < 2: return None
+
+    request_line = req_parts[1]
+    req_tokens = request_line.split()
+    method = req_tokens[0] if len(req_tokens) > 0 else "-"
+    path = req_tokens[1] if len(req_tokens) > 1 else "-"
+
+    if len(req_parts) > 2 and req_parts[2].strip():
+         status_part = req_parts[2].strip().split()[0]
+         status_code = int(status_part) if status_part.isdigit() else 0
+    else:
+         status_code = 0
+    user_agent = req_parts[5] if len(req_parts) > 5 else "-"
+    is_blocked = status_code in [403, 401]
+
+    category, attack_type = classifier.classify(line, status_code)
+
+    return {
+        "ts": dt.timestamp(),
+        "ip": ip_part,
+        "method": method,
+        "path": path,
+        "status": status_code,
+        "blocked": is_blocked,
+        "category": category if is_blocked else None,
+        "attack_type": attack_type,
+        "country": get_country(ip_part),
+        "user_agent": user_agent,
+        "duration": None,
+    }
+
 def analyze_logs(time_range: str = "live") -> StatsResponse:
     # 1. System Stats (Real)
     cpu_load = f"{psutil.cpu_percent()}%"
-    
+
     # 2. Define Time Window and Granularity
     now = datetime.datetime.now(datetime.timezone.utc)
-    
+
     if time_range == "1h":
         window_size = datetime.timedelta(hours=1)
-        step = datetime.timedelta(minutes=5) # 12 points
+        step = RESOLUTIONS["5m"] # 12 points
         label_fmt = "%H:%M"
     elif time_range == "24h":
         window_size = datetime.timedelta(hours=24)
-        step = datetime.timedelta(hours=1) # 24 points
+        step = RESOLUTIONS["1h"] # 24 points
         label_fmt = "%H:00"
     elif time_range == "3d":
         window_size = datetime.timedelta(days=3)
-        step = datetime.timedelta(hours=3) # 24 points
+        step = RESOLUTIONS["3h"] # 24 points
         label_fmt = "%d %b %H:%M"
     elif time_range == "7d":
         window_size = datetime.timedelta(days=7)
-        step = datetime.timedelta(days=1) # 7 points
+        step = RESOLUTIONS["1d"] # 7 points
         label_fmt = "%d %b"
     else: # "live" - default to last 30 minutes
         window_size = datetime.timedelta(minutes=30)
-        step = datetime.timedelta(minutes=2) # 15 points
+        step = RESOLUTIONS["2m"] # 15 points
         label_fmt = "%H:%M"
 
-    start_time = now - window_size
-    
-    # 3. Initialize Buckets
-    # We calculate how many buckets we need.
-    num_buckets = int(window_size.total_seconds() / step.total_seconds())
-    # Adjust slightly if rounding issues, but fixed numbers are safer for UI.
-    # Let's use flexible buckets.
-    
+    # Window is aligned to whole minutes and ends with the current minute,
+    # matching the resolution of the rollup cells.
+    window_sec = int(window_size.total_seconds())
+    now_ts = int(now.timestamp())
+    start_ts = now_ts - now_ts % 60 + 60 - window_sec
+    start_time = datetime.datetime.fromtimestamp(start_ts, tz=datetime.timezone.utc)
+
+    # 3. Sum pre-aggregated minute cells instead of scanning log lines
+    get_tailer().poll()
+    num_buckets = window_sec // step
+    rollups = get_rollups()
+    totals, cells = rollups.series(start_ts, step, num_buckets)
+    unique_clients, unique_attackers = rollups.uniques(start_ts, start_ts + window_sec)
+
+    # Bucket labels use the START of each bucket
     buckets = []
-    bucket_map = {} # index -> TrafficPoint
-    
-    # Pre-fill buckets with correct time labels
-    # We iterate from 0 to num_buckets-1
-    for i in range(num_buckets):
-        bucket_time = start_time + (step * i)
-        # For "live" or "1h", we might want the label to be the END of the bucket or START.
-        # Let's use START of bucket for simplicity.
+    for i, cell in enumerate(cells):
+        bucket_time = start_time + datetime.timedelta(seconds=step * i)
         label = bucket_time.strftime(label_fmt)
-        tp = TrafficPoint(time=label, valid=0, blocked=0)
-        buckets.append(tp)
-        # We don't need a map if we index by math, but let's keep list 'buckets' ordered.
-
-    total_req = 0
-    blocked = 0
-    attacks = defaultdict(int) 
-    # Init keys for API consistency
-    for k in ["sql_injection", "xss", "lfi", "rce", "bad_bots", "brute_force", "dos", "protocol"]:
-        attacks[k] = 0
-    
+        buckets.append(TrafficPoint(time=label, valid=cell[0], blocked=cell[1]))
+
+    total_req = totals[0] + totals[1]
+    blocked = totals[1]
+    attacks = {k: totals[i] for i, k in enumerate(ROLLUP_FIELDS) if i >= 2}
+
     # Fetch current rule configuration
     rules_config = system_service.get_waf_rules()
     rule_status = {r['id']: ("Active" if r['enabled'] else "Inactive") for r in rules_config}
-    
-    # 4. Read and Process Logs
-    if os.path.exists(settings.ACCESS_LOG_PATH):
-        try:
-            with open(settings.ACCESS_LOG_PATH, "r") as f:
-                lines = f.readlines()
-                
-                for line in lines:
-                    log_time = None
-                    line_lower = line.lower()
-                    is_blocked = False
-                    
-                    # --- CADDY JSON FORMAT ---
-                    if line.strip().startswith("{"):
-                        try:
-                            log_entry = json.loads(line)
-                            log_time = parse_caddy_time(log_entry.get('ts'))
-                            status = log_entry.get('status', 0)
-                            is_blocked = status in [403, 401] or (status >= 400 and status < 500) # Simple heuristic
-                            
-                            # Reconstruct line_lower for attack detection compatibility
-                            # Dump necessary fields like request uri, headers, etc.
-                            req = log_entry.get('request', {})
-                            line_lower = json.dumps(log_entry).lower()
-                            
-                        except:
-                            continue
-                    
-                    # --- NGINX COMMON LOG FORMAT ---
-                    else:
-                        # Parse Time
-                        # Log format: IP - - [TIMESTAMP] ...
-                        parts = line.split(' [')
-                        if len(parts) > 1:
-                            time_part = parts[1].split(']')[0]
-                            log_time = parse_nginx_time(time_part)
-                            is_blocked = ' 403 ' in line or ' 401 ' in line
-                    
-                    if log_time:
-                        # Filter
-                        if log_time < start_time:
-                            continue
-                        if log_time > now:
-                            continue 
-                        
-                        # Increment Counters
-                        total_req += 1
-                        if is_blocked:
-                            blocked += 1
-                        
-                        # Categorize Attack
-                        if is_blocked:
-                            if "union" in line_lower or "select" in line_lower or " or " in line_lower or "='" in line:
-                                attacks["sql_injection"] += 1
-                            elif "<script>" in line_lower or "alert(" in line_lower or "onerror=" in line_lower:
-                                attacks["xss"] += 1
-                            elif "../" in line or "..%2f" in line_lower or "/etc/passwd" in line_lower:
-                                attacks["lfi"] += 1
-                            elif "; cat" in line_lower or "; ls" in line_lower or "$(whoami)" in line_lower or "cmd=" in line_lower:
-                                attacks["rce"] += 1
-                            elif "nmap" in line_lower or "sqlmap" in line_lower or "nikto" in line_lower or "bot" in line_lower:
-                                attacks["bad_bots"] += 1
-                            elif "login" in line_lower or "admin" in line_lower:
-                                attacks["brute_force"] += 1
-                            elif " 503 " in line or "ratelimit" in line_lower:
-                                attacks["dos"] += 1
-                            elif " 400 " in line or " 405 " in line or " 413 " in line or " 414 " in line:
-                                attacks["protocol"] += 1
-                            else:
-                                attacks["bad_bots"] += 1
-                        
-                        # Map to Bucket
-                        idx = int((log_time - start_time).total_seconds() / step.total_seconds())
-                        if 0 <= idx < len(buckets):
-                            if is_blocked:
-                                buckets[idx].blocked += 1
-                            else:
-                                buckets[idx].valid += 1
-
-        except Exception as e:
-            print(f"Error reading logs: {e}")
 
     # Build Modules List
     modules_list = [
@@ -195,362 +285,228 @@ def analyze_logs(time_range: str = "live") -> StatsResponse:
     return StatsResponse(
         total_requests=total_req,
         blocked_attacks=blocked,
-        avg_latency="15ms", 
+        unique_clients=unique_clients,
+        unique_attackers=unique_attackers,
+        avg_latency="15ms",
         cpu_load=cpu_load,
         system_status="OPERATIONAL",
         attack_modules=modules_list,
         traffic_chart=buckets
     )
 
-def get_active_ips(window_minutes: int = 60):
+def get_active_ips(window_minutes: int = None):
     from app.models.schemas import ActiveIp
-    
-    # 1. Get Current Rules
-    rules = system_service.get_ip_rules()
-    # Map IP -> Action ('deny', 'allow')
-    rule_map = {r['ip']: r['action'] for r in rules}
-    
-    # 2. Parse Logs
-    ip_stats = defaultdict(lambda: {"req": 0, "atk": 0, "last": datetime.datetime.min})
-    
-    now = datetime.datetime.now(datetime.timezone.utc)
-    start_time = now - datetime.timedelta(minutes=window_minutes)
-    
-    if os.path.exists(settings.ACCESS_LOG_PATH):
-        try:
-            with open(settings.ACCESS_LOG_PATH, "r") as f:
-                lines = f.readlines()
-                # Debug: if lines is huge, we might want to slice the last N lines to be faster
-                # But for < 100k lines it's fine.
-                
-                for line in lines:
-                    dt = None
-                    ip = "Unknown"
-                    is_attack = False
-                    
-                    if line.strip().startswith("{"):
-                        try:
-                            # Caddy JSON
-                            data = json.loads(line)
-                            dt = parse_caddy_time(data.get('ts'))
-                            req = data.get('request', {})
-                            ip = req.get('remote_ip', '0.0.0.0')
-                            status = data.get('status', 0)
-                            if status in [403, 401]:
-                                is_attack = True
-                        except:
-                            continue
-                    else:
-                        # Nginx
-                        parts = line.split(' [')
-                        if len(parts) > 1:
-                            ip = line.split(' - -')[0].strip()
-                            time_part = parts[1].split(']')[0]
-                            dt = parse_nginx_time(time_part)
-                            if ' 403 ' in line or ' 401 ' in line:
-                                is_attack = True
-                    
-                    if dt:
-                        # Fallback if parsing fails to ensure data visibility
-                        # if dt is None: dt = now # logic above guarantees dt is set if we enter here
-
-                        if dt >= start_time:
-                            s = ip_stats[ip]
-                            s["req"] += 1
-                            if s["last"] == datetime.datetime.min or dt > s["last"]:
-                                s["last"] = dt
-                            
-                            if is_attack:
-                                s["atk"] += 1
-                                
-        except Exception as e:
-            print(f"Error parse active ips: {e}")
+
+    # Summary hanya menyimpan ACTIVE_IP_WINDOW_MINUTES terakhir; window lebih besar ditolak
+    max_minutes = settings.ACTIVE_IP_WINDOW_MINUTES
+    window_minutes = window_minutes or max_minutes
+    if not 1 <= window_minutes <= max_minutes:
+        raise ValueError(f"window_minutes must be between 1 and {max_minutes} (ACTIVE_IP_WINDOW_MINUTES)")
+
+    # 1. Current rules, compiled for CIDR longest-prefix match
+    matcher = system_service.get_rule_matcher()
+
+    # 2. Top talkers from the streaming summary (bounded memory, O(K) to serve)
+    tailer = get_tailer()
+    tailer.poll()
+    top = get_heavy_hitters().top(50, window_minutes * 60)
 
     # 3. Format Result
     results = []
-    countries = ["US", "DE", "CN", "RU", "ID", "SG", "JP", "BR"]
-    
-    for ip, stats in ip_stats.items():
-        # Determine Status
-        r_status = "None"
-        if ip in rule_map:
-            r_status = "Blocked" if rule_map[ip] == "deny" else "Allowed"
-            
-        # Fake Country (deterministic by IP)
-        c_idx = sum(map(ord, ip)) % len(countries)
-        
+
+    for ip, count, error, attacks, last_ts in top:
+        rule = matcher.match(ip)
+        last_seen = datetime.datetime.fromtimestamp(last_ts, tz=datetime.timezone.utc)
+
         results.append(ActiveIp(
             ip=ip,
-            country=countries[c_idx],
-            request_count=stats["req"],
-            attack_count=stats["atk"],
-            last_seen=stats["last"].strftime("%H:%M:%S"),
-            rule_status=r_status
+            country=get_country(ip),
+            request_count=count,
+            count_error=error,
+            attack_count=attacks,
+            last_seen=last_seen.strftime("%H:%M:%S"),
+            rule_status=RULE_STATUS.get(rule["action"], "None") if rule else "None",
+            matched_rule=rule["ip"] if rule else None
         ))
-        
-    # Sort by activity (desc)
-    results.sort(key=lambda x: x.request_count, reverse=True)
-    return results[:50] # Top 50
 
-def get_attack_type(line: str, status_code: int) -> str:
-    line_lower = line.lower()
-    
-    # Check for specific patterns
-    if "union" in line_lower or "select" in line_lower or " or " in line_lower or "='" in line:
-        return "SQL Injection"
-    if "<script>" in line_lower or "alert(" in line_lower or "onerror=" in line_lower:
-        return "XSS"
-    if "../" in line or "..%2f" in line_lower or "/etc/passwd" in line_lower:
-        return "LFI"
-    if "; cat" in line_lower or "; ls" in line_lower or "$(whoami)" in line_lower or "cmd=" in line_lower:
-        return "RCE"
-    if "nmap" in line_lower or "sqlmap" in line_lower or "nikto" in line_lower or "bot" in line_lower:
-        return "Scanner"
-    if "head /" in line_lower: # Simple heuristic
-        return "Scanner"
-    if "login" in line_lower or "admin" in line_lower:
-        # Heuristic for BF if status is 4xx, but let's label it interesting anyway
-        return "Brute Force"
-    if status_code == 503:
-        return "HTTP Flood"
-    if status_code in [400, 405, 413, 414]:
-        return "Protocol Violation"
-    
-    if status_code >= 400 and status_code < 500:
-         return "Suspicious"
-         
-    return "Safe"
+    # Already sorted by activity (desc), top 50
+    return results
 
-def get_waf_logs(page: int = 1, limit: int = 10, search: str = None, status: str = None, attack_type: str = None, time_range: str = "Last 24h"):
+def read_log_events(start_ts: float, end_ts: float = None, newest_first: bool = False):
+    """Yields parsed events of the access log with start_ts <= ts < end_ts.
+
+    Only the lines inside the range (plus at most one index stride) are
+    parsed: the time index gives the offset where the range starts, read
+    forwards with seek or, for newest_first, backwards from the end of the
+    file with the mmap reverse reader.
+    """
+    try:
+        st = os.stat(settings.ACCESS_LOG_PATH)
+    except FileNotFoundError:
+        return
+    offset = get_log_index().seek((st.st_dev, st.st_ino), start_ts, st.st_size) or 0
+
+    if newest_first:
+        lines = iter_lines_reverse(settings.ACCESS_LOG_PATH, start=offset)
+    else:
+        lines = iter_lines_forward(settings.ACCESS_LOG_PATH, start=offset)
+
+    for raw in lines:
+        event = parse_log_event(raw.decode("utf-8", errors="replace"))
+        if event is None or event["ts"] < start_ts:
+            continue
+        if end_ts is not None and event["ts"] >= end_ts:
+            continue
+        yield event
+
+def export_logs_csv(time_range: str = "24h"):
+    """Streams the raw access log events in the selected range as CSV chunks, newest first like the log viewer"""
+    import csv
+    import io
+
+    range_map = {
+        "1h": datetime.timedelta(hours=1),
+        "24h": datetime.timedelta(hours=24),
+        "3d": datetime.timedelta(days=3),
+        "7d": datetime.timedelta(days=7),
+    }
+    start_ts = time.time() - range_map.get(time_range, range_map["24h"]).total_seconds()
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["Timestamp", "Source IP", "Country", "Method", "Path", "Status", "Attack Type", "User Agent"])
+    for event in read_log_events(start_ts, newest_first=True):
+        dt = datetime.datetime.fromtimestamp(event["ts"], tz=datetime.timezone.utc)
+        writer.writerow([
+            dt.strftime("%Y-%m-%d %H:%M:%S"),
+            event["ip"],
+            event["country"],
+            event["method"],
+            event["path"],
+            event["status"],
+            event["attack_type"],
+            event["user_agent"],
+        ])
+        if buffer.tell() > 65536:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def encode_log_cursor(ts: float, event_id: int) -> str:
+    """Opaque keyset cursor: position of the last event on the current page"""
+    raw = json.dumps([ts, event_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_log_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, event_id = json.loads(base64.urlsafe_b64decode(padded))
+        return float(ts), int(event_id)
+    except Exception:
+        return None
+
+def get_waf_logs(page: int = 1, limit: int = 10, search: str = None, status: str = None, attack_type: str = None, time_range: str = "Last 24h", cursor: str = None):
 
-    logs = []
-    
-    args = [search, status, attack_type, time_range]
-    # Default if no specific filters (Time range defaults to Last 24h, so if it is default, we can consider it "default" ONLY if we assume log file is small or recent. But for big logs, 24h is a filter).
-    # Actually, if time_range is "Last 24h" (default), we usually want to verify. 
-    # Let's consider "default filter" only if NO filters are touched.
-    # However, user asks to fix "filter table".
-    # For optimization: If (search is None) AND (status is All) AND (attack_type is All) AND (time_range is All/Lifetime or just ignored), we do direct slice.
-    # But current default `time_range` is "Last 24h". 
-    # Let's handle "Last 24h" as a filter.
-    
     # Calculate cutoff time
     now = datetime.datetime.now(datetime.timezone.utc)
-    cutoff_time = datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
-    
+    cutoff_ts = 0
+
     if time_range == "Last Hour":
-        cutoff_time = now - datetime.timedelta(hours=1)
+        cutoff_ts = (now - datetime.timedelta(hours=1)).timestamp()
     elif time_range == "Last 24h":
-        cutoff_time = now - datetime.timedelta(hours=24)
+        cutoff_ts = (now - datetime.timedelta(hours=24)).timestamp()
     elif time_range == "Last 3d":
-        cutoff_time = now - datetime.timedelta(days=3)
+        cutoff_ts = (now - datetime.timedelta(days=3)).timestamp()
     elif time_range == "Last 7d":
-        # Note: frontend sends "Last 7d" but initially it was "7 Days". 
+        # Note: frontend sends "Last 7d" but initially it was "7 Days".
         # We handle both just in case.
-        cutoff_time = now - datetime.timedelta(days=7)
+        cutoff_ts = (now - datetime.timedelta(days=7)).timestamp()
     elif time_range == "7 Days":
-        cutoff_time = now - datetime.timedelta(days=7)
-    
-    # Check if we can use optimized path
-    # We can ONLY use optimized path if we are NOT filtering by anything AND time_range covers 'everything' (e.g. log file is newer than cutoff).
-    # Safest is to use fallback scan if ANY filter is active.
-    # We will assume "Last 24h" is a filter that requires scanning unless we are sure.
-    # For this implementation, let's treat any time_range other than "All" (if we had it) as a filter.
-    is_strict_default = (search is None or search == "") and (status is None or status == "All") and (attack_type is None or attack_type == "All") and (time_range == "All Time")  
-
-    if os.path.exists(settings.ACCESS_LOG_PATH):
-        try:
-            with open(settings.ACCESS_LOG_PATH, "r") as f:
-                lines = f.readlines()
-                total = len(lines)
-                
-                # Optimized Path for Default Filters (Direct Slicing)
-                if is_strict_default:
-                    # Reverse Index Logic
-                    # Newest is at index len-1. 
-                    # Page 1 (0-10) -> indices [len-1, len-2 ... len-10]
-                    start_idx = (page - 1) * limit
-                    end_idx = start_idx + limit
-                    
-                    # Ensure boundaries
-                    # If total=100, page=1, start=0, end=10.
-                    # We want lines from (total-1-0) down to (total-1-9)
-                    
-                    logs_data = []
-                    count = 0
-                    # Iterate backwards from end of file
-                    for i in range(len(lines) - 1, -1, -1):
-                        if count >= end_idx:
-                            break
-                        
-                        if count >= start_idx:
-                            line = lines[i]
-                            # Parse SINGLE line
-                            parsed = parse_single_line_safely(line, i, len(lines))
-                            if parsed:
-                                logs.append(parsed)
-                                
-                        count += 1
-                        
-                    return WafLogListResponse(
-                        data=logs,
-                        total=total,
-                        page=page,
-                        limit=limit,
-                        total_pages=math.ceil(total / limit)
-                    )
-
-                # Fallback: Full Scan for Filtered Results (Existing Logic)
-                # Parse in reverse to show newest first
-                for i, line in enumerate(reversed(lines)):
-                    # existing parsing logic...
-                    try:
-                        entry = parse_single_line_safely(line, i, len(lines))
-                        if not entry: continue
-
-                        # Filtering
-                        # Filtering
-                        # Time Filter
-                        try:
-                            # entry.timestamp is "27/Oct/2023:14:02:11" OR "14:02:11" (from Caddy parsed above)
-                            # The Caddy parsing logic above returns just time string for WafLogEntry.
-                            # We need full datetime to compare with cutoff. 
-                            # But wait, WafLogEntry only stores friendly string!
-                            # This reverse scan optimization needs the REAL datetime object.
-                            # We can re-parse from the entry string if it has date, but Caddy one only put %H:%M:%S in the change above.
-                            # FIX above: Let's make WafLogEntry store full string if possible or we parse directly from line again.
-                            # Simpler: Re-parse the line here to get the check, OR improve WafLogEntry to hold raw timestamp.
-                            # Given strictness, let's re-parse line's time quickly.
-                            
-                            dt_check = None
-                            if line.strip().startswith("{"):
-                                # Caddy
-                                d = json.loads(line)
-                                dt_check = parse_caddy_time(d.get('ts'))
-                            else:
-                                # Nginx: 27/Oct/2023:14:02:11
-                                # WafLogEntry timestamp might just be 14:02:11 if using old logic?
-                                # Let's parse from line raw
-                                parts = line.split(' [')
-                                if len(parts) > 1:
-                                    t = parts[1].split(']')[0]
-                                    dt_check = parse_nginx_time(t)
-                                    
-                            if dt_check and dt_check < cutoff_time:
-                                # Optimization: Since we read reversed (newest first), 
-                                # if current log is older than cutoff, all subsequent logs are also older.
-                                break
-                        except:
-                            # If parsing fails, maybe include or exclude?
-                            pass
-
-                        if search:
-                            s = search.lower()
-                            if s not in entry.source_ip.lower() and s not in entry.path.lower() and s not in entry.attack_type.lower():
-                                continue
-
-                        if status and status != "All":
-                            # Generic check -> if status filter is a number, match it exactly
-                            if status.isdigit() and entry.status_code != int(status):
-                                continue
-
-                        if attack_type and attack_type != "All":
-                            if attack_type == "Attacks Only":
-                                if entry.attack_type == "Safe": continue
-                            elif attack_type == "Safe Traffic" or attack_type == "Allowed Only":
-                                if entry.attack_type != "Safe": continue
-                            elif entry.attack_type != attack_type:
-                                 continue
-                        
-                        logs.append(entry)
-                    except Exception:
-                        continue
-                        
-        except Exception as e:
-            print(f"Error parse logs: {e}")
-
-    # Pagination for Filtered Results
-    total = len(logs)
-    start = (page - 1) * limit
-    end = start + limit
-    data = logs[start:end]
-    
+        cutoff_ts = (now - datetime.timedelta(days=7)).timestamp()
+
+    get_tailer().poll()
+
+    # Filters and pagination run as indexed SQL over waf_events
+    where = ["ts >= ?"]
+    params = [cutoff_ts]
+
+    if search:
+        clause, clause_params = get_event_store().search_clause(search)
+        where.append(clause)
+        params += clause_params
+
+    if status and status != "All":
+        # Generic check -> if status filter is a number, match it exactly
+        if status.isdigit():
+            where.append("status = ?")
+            params.append(int(status))
+
+    if attack_type and attack_type != "All":
+        if attack_type == "Attacks Only":
+            where.append("attack_type != 'Safe'")
+        elif attack_type == "Safe Traffic" or attack_type == "Allowed Only":
+            where.append("attack_type = 'Safe'")
+        else:
+            where.append("attack_type = ?")
+            params.append(attack_type)
+
+    where_sql = " AND ".join(where)
+    page_where, page_params = where_sql, list(params)
+    offset = (page - 1) * limit
+
+    # Keyset pagination: continue right after the (ts, id) of the previous page,
+    # so deep pages cost the same as page 1. Plain page numbers still work.
+    position = decode_log_cursor(cursor) if cursor else None
+    if position:
+        last_ts, last_id = position
+        page_where += " AND ts <= ? AND (ts < ? OR id < ?)"
+        page_params += [last_ts, last_ts, last_id]
+        offset = 0
+
+    with get_db_connection() as conn:
+        # Total is a capped count: exact for small results, a lower bound beyond the cap
+        total = conn.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM waf_events WHERE {where_sql} LIMIT ?)",
+            params + [settings.LOG_COUNT_CAP]
+        ).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT * FROM waf_events WHERE {page_where} ORDER BY ts DESC, id DESC LIMIT ? OFFSET ?",
+            page_params + [limit + 1, offset]
+        ).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_log_cursor(rows[-1]["ts"], rows[-1]["id"])
+
     return WafLogListResponse(
-        data=data,
+        data=[to_log_entry(r) for r in rows],
         total=total,
         page=page,
         limit=limit,
-        total_pages=math.ceil(total / limit)
+        total_pages=math.ceil(total / limit),
+        next_cursor=next_cursor,
+        total_is_estimate=total >= settings.LOG_COUNT_CAP
     )
 
-def parse_single_line_safely(line, index, total_lines):
-    try:
-        if line.strip().startswith("{"):
-            # Caddy JSON
-            data = json.loads(line)
-            ts = data.get('ts')
-            timestamp_str = "Unknown"
-            if ts:
-                dt = datetime.datetime.fromtimestamp(ts, tz=datetime.timezone.utc)
-                timestamp_str = dt.strftime("%H:%M:%S")
-
-            req = data.get('request', {})
-            ip_part = req.get('remote_ip', '-')
-            method = req.get('method', '-')
-            path = req.get('uri', '-')
-            status_code = data.get('status', 0)
-            
-            # Reconstruct attack type context
-            line_str = json.dumps(data)
-            current_type = get_attack_type(line_str, status_code)
-        else:
-            # Nginx
-            parts = line.split(' [')
-            if len(parts) < 2: return None
-            
-            ip_part = line.split(' - -')[0].strip()
-            time_part_raw = parts[1].split(']')[0]
-            timestamp_str = time_part_raw.split(' ')[0] # Remove +0000
-            
-            rest = parts[1].split(']')[1]
-            req_parts = rest.split('"')
-            if len(req_parts) < 2: return None
-            
-            request_line = req_parts[1]
-            req_tokens = request_line.split()
-            method = req_tokens[0] if len(req_tokens) > 0 else "-"
-            path = req_tokens[1] if len(req_tokens) > 1 else "-"
-            
-            if len(rest.split('"')) > 2:
-                 status_part = rest.split('"')[2].strip().split()[0]
-                 status_code = int(status_part) if status_part.isdigit() else 0
-            else:
-                 status_code = 0
-            
-            current_type = get_attack_type(line, status_code)
-        
-        if status_code == 200 and current_type == "Suspicious":
-            current_type = "Safe"
-            
-        countries = ["US", "DE", "CN", "RU", "ID", "SG", "JP", "BR"]
-        c_idx = sum(map(ord, ip_part)) % len(countries)
-
-        return WafLogEntry(
-            id=total_lines - index, # ID based on line number (approx)
-            timestamp=timestamp_str,
-            source_ip=ip_part,
-            method=method,
-            path=path,
-            attack_type=current_type,
-            status_code=status_code,
-            country=countries[c_idx]
-        )
-    except:
-        return None
-
-    return "\n".join(output)
+def to_log_entry(row) -> WafLogEntry:
+    dt = datetime.datetime.fromtimestamp(row["ts"], tz=datetime.timezone.utc)
+
+    return WafLogEntry(
+        id=row["id"],
+        timestamp=dt.strftime("%d/%b/%Y:%H:%M:%S"),
+        source_ip=row["ip"],
+        method=row["method"],
+        path=row["path"],
+        attack_type=row["attack_type"],
+        status_code=row["status"],
+        country=row["country"],
+        rule_status=system_service.get_rule_matcher().rule_status(row["ip"])
+    )
 
-    return "\n".join(output)
+def get_country(ip: str) -> str:
+    return get_geoip().country(ip)
 
 def generate_html_report(time_range: str = "24h") -> str:
     """Generates a rich HTML report with charts and stats"""
@@ -652,7 +608,7 @@ def generate_html_report(time_range: str = "24h") -> str:
                 <span class="w-1.5 h-1.5 bg-blue-600 rounded-full"></span>
                 Executive Summary
             </h2>
-            <div class="grid grid-cols-4 gap-6">
+            <div class="grid grid-cols-3 gap-6">
                 <!-- ... (Cards remain same) ... -->
                 <div class="bg-white p-6 rounded-xl border border-slate-200 shadow-sm relative overflow-hidden group">
                     <div class="text-slate-500 text-xs font-bold uppercase tracking-wider mb-2">Total Requests</div>
@@ -668,6 +624,20 @@ def generate_html_report(time_range: str = "24h") -> str:
                          <svg xmlns="http://www.w3.org/2000/svg" class="w-16 h-16" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M12 22s8-4 8-10V5l-8-3-8 3v7c0 6 8 10 8 10z"/></svg>
                     </div>
                 </div>
+                <div class="bg-white p-6 rounded-xl border border-slate-200 shadow-sm relative overflow-hidden group">
+                    <div class="text-slate-500 text-xs font-bold uppercase tracking-wider mb-2">Unique Clients</div>
+                    <div class="text-3xl font-bold text-slate-900">~{stats.unique_clients}</div>
+                    <div class="absolute right-0 bottom-0 p-4 opacity-5 group-hover:opacity-10 transition-opacity">
+                         <svg xmlns="http://www.w3.org/2000/svg" class="w-16 h-16" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M17 21v-2a4 4 0 0 0-4-4H5a4 4 0 0 0-4 4v2"/><circle cx="9" cy="7" r="4"/><path d="M23 21v-2a4 4 0 0 0-3-3.87"/><path d="M16 3.13a4 4 0 0 1 0 7.75"/></svg>
+                    </div>
+                </div>
+                <div class="bg-white p-6 rounded-xl border border-slate-200 shadow-sm relative overflow-hidden group">
+                    <div class="text-slate-500 text-xs font-bold uppercase tracking-wider mb-2">Unique Attackers</div>
+                    <div class="text-3xl font-bold text-rose-600">~{stats.unique_attackers}</div>
+                    <div class="absolute right-0 bottom-0 p-4 opacity-5 group-hover:opacity-10 transition-opacity text-rose-600">
+                         <svg xmlns="http://www.w3.org/2000/svg" class="w-16 h-16" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><path d="M20 21v-2a4 4 0 0 0-4-4H8a4 4 0 0 0-4 4v2"/><circle cx="12" cy="7" r="4"/></svg>
+                    </div>
+                </div>
                 <div class="bg-white p-6 rounded-xl border border-slate-200 shadow-sm relative overflow-hidden group">
                     <div class="text-slate-500 text-xs font-bold uppercase tracking-wider mb-2">Avg Latency</div>
                     <div class="text-3xl font-bold text-blue-600">{stats.avg_latency}</div>
@@ -0,0 +1,280 @@
+import os
+import time
+import threading
+import functools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from app.services.log_index import index_points
+
+# Ukuran blok baca; backlog besar dibaca bertahap supaya memori tetap kecil
+READ_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Potongan file per task di mode paralel (minimal)
+PARALLEL_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def parse_lines(parser, data: bytes, base: int):
+    """Parse newline-separated ``data`` starting at byte ``base`` of the file.
+
+    Returns the parsed events, each tagged with the offset of its line.
+    """
+    events = []
+    pos = base
+    for raw in data.split(b"\n"):
+        offset = pos
+        pos += len(raw) + 1
+        if not raw.strip():
+            continue
+        event = parser(raw.decode("utf-8", errors="replace"))
+        if event is None:
+            continue
+        event["offset"] = offset
+        events.append(event)
+    return events
+
+
+def parse_range(path, parser, start: int, end: int, file_id, partials, keep_events: bool):
+    """Worker task of a parallel backfill: parse the lines in ``[start, end)``.
+
+    ``start`` must be a line start. Returns the offset after the last
+    complete line, the number of events, ``partial(events)`` for every
+    partial function, and the events themselves only if ``keep_events``
+    (some subscriber has no partial). The parent then only merges small,
+    already-aggregated results instead of every event dict.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    cut = data.rfind(b"\n")
+    events = parse_lines(parser, data[:cut], start) if cut != -1 else []
+    for event in events:
+        event["file_id"] = file_id
+    return (
+        start + cut + 1 if cut != -1 else start,
+        len(events),
+        [partial(events) for partial in partials],
+        events if keep_events else [],
+    )
+
+
+class LogTailer:
+    """Incremental reader for the access log.
+
+    Remembers the byte offset and inode of ``path`` so every poll only parses
+    lines appended since the previous one. Handles truncation (copytruncate)
+    and rename-style logrotate by draining the old handle before reopening.
+    Every newly parsed batch is pushed to the registered subscribers.
+
+    With a LogTimeIndex the first open seeks straight to the start of the
+    retention window instead of parsing the whole file. A backlog larger
+    than ``parallel_min_bytes`` (cold start, large catch-up) is split on
+    line boundaries and parsed by ``workers`` processes.
+    """
+
+    def __init__(self, path, parser, retention_seconds=7 * 86400, index=None,
+                 workers=1, parallel_min_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.parser = parser
+        self.retention_seconds = retention_seconds
+        self.subscribers = []
+        self.index = index
+        self.workers = workers
+        self.parallel_min_bytes = parallel_min_bytes
+        if index is not None:
+            self.subscribe(
+                index.add_events,
+                partial=functools.partial(index_points, stride_lines=index.stride_lines, stride_seconds=index.stride_seconds),
+                merge=index.merge,
+            )
+
+        self._fh = None
+        self._file_id = None
+        self._offset = 0
+        self._partial = b""
+
+        # _poll_lock serialises readers of the file
+        self._poll_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Subscribers ---
+
+    def subscribe(self, callback, partial=None, merge=None):
+        """Register ``callback(events)``, called with every newly parsed batch.
+
+        Subscribers that only aggregate can also pass a picklable
+        ``partial(events)`` function: during a parallel backfill it runs in
+        the parse workers and ``merge(result)`` is called instead of
+        ``callback``.
+        """
+        self.subscribers.append((callback, partial, merge))
+
+    # --- Background Thread ---
+
+    def start(self, interval: float = 1.0):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="log-tailer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self.index is not None:
+            self.index.close()
+
+    def _run(self, interval):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Error tailing logs: {e}")
+            self._stop.wait(interval)
+
+    # --- Reading ---
+
+    def poll(self, wait: bool = False) -> int:
+        """Parse lines appended since the last poll and return how many events were added.
+
+        With ``wait=False`` a caller that finds another poll in progress returns
+        immediately and reads whatever state is already available.
+        """
+        if not self._poll_lock.acquire(blocking=wait):
+            return 0
+        try:
+            return self._poll_locked()
+        finally:
+            self._poll_lock.release()
+
+    def _poll_locked(self) -> int:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            # Rotated away and the new file is not there yet: finish the old one
+            return self._drain() if self._fh else 0
+
+        file_id = (st.st_dev, st.st_ino)
+        added = 0
+
+        if self._fh is None:
+            self._open(file_id)
+            if self.index is not None:
+                # Cold start: skip the part of the log older than the window
+                offset = self.index.seek(file_id, time.time() - self.retention_seconds, st.st_size)
+                if offset is None:
+                    # Index is stale (rotated/truncated while we were down)
+                    self.index.reset(file_id)
+                    offset = 0
+                self._offset = offset
+        elif file_id != self._file_id:
+            # Logrotate (rename): read what is left in the old file, then switch
+            added += self._drain()
+            self._fh.close()
+            self._open(file_id)
+        elif st.st_size < self._offset:
+            # Truncated in place (copytruncate)
+            self._offset = 0
+            self._partial = b""
+            if self.index is not None:
+                self.index.reset(file_id)
+
+        return added + self._drain()
+
+    def _open(self, file_id):
+        self._fh = open(self.path, "rb")
+        self._file_id = file_id
+        self._offset = 0
+        self._partial = b""
+
+    def _drain(self) -> int:
+        added = 0
+        if self.workers > 1 and not self._partial:
+            size = os.fstat(self._fh.fileno()).st_size
+            if size - self._offset >= self.parallel_min_bytes:
+                try:
+                    added += self._drain_parallel(size)
+                except Exception as e:
+                    # Sisa backlog dibaca serial dari offset terakhir
+                    print(f"Parallel log parse failed, continuing serially: {e}")
+        self._fh.seek(self._offset)
+        while True:
+            chunk = self._fh.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            # Byte offset of data[0] in the file
+            base = self._offset - len(self._partial)
+            self._offset += len(chunk)
+
+            data = self._partial + chunk
+            cut = data.rfind(b"\n")
+            if cut == -1:
+                self._partial = data
+                continue
+            self._partial = data[cut + 1:]
+            added += self._ingest(data[:cut], base)
+        return added
+
+    def _drain_parallel(self, size: int) -> int:
+        """Parse ``[offset, size)`` in a process pool, in file order."""
+        start = self._offset
+        chunk = max(PARALLEL_CHUNK_SIZE, (size - start) // (self.workers * 4))
+        bounds = [start]
+        pos = start + chunk
+        while pos < size:
+            # Geser batas ke awal baris berikutnya
+            self._fh.seek(pos)
+            self._fh.readline()
+            pos = self._fh.tell()
+            if pos >= size:
+                break
+            bounds.append(pos)
+            pos += chunk
+        bounds.append(size)
+
+        partials = [partial for _, partial, merge in self.subscribers if partial is not None]
+        # Event lengkap hanya dikirim balik ke parent kalau ada subscriber tanpa partial
+        keep_events = len(partials) < len(self.subscribers)
+        # _offset maju per chunk, jadi kalau pool gagal di tengah tidak ada yang terbaca dua kali
+        added = 0
+        # spawn: fork dari proses yang sudah punya thread tidak aman
+        context = multiprocessing.get_context("spawn")
+        ranges = iter(zip(bounds[:-1], bounds[1:]))
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+            # Hanya ~workers chunk yang jalan/menunggu; chunk berikutnya disubmit saat satu selesai
+            # dipublish, jadi hasil worker tidak menumpuk di memori kalau publish lebih lambat
+            def submit(lo, hi):
+                return pool.submit(parse_range, self.path, self.parser, lo, hi, self._file_id, partials, keep_events)
+
+            pending = deque(submit(lo, hi) for lo, hi in islice(ranges, self.workers))
+            while pending:
+                end, count, results_partial, events = pending.popleft().result()
+                for lo, hi in islice(ranges, 1):
+                    pending.append(submit(lo, hi))
+                self._publish(events, results_partial)
+                added += count
+                self._offset = end
+        return added
+
+    def _ingest(self, data: bytes, base: int) -> int:
+        return self._publish(parse_lines(self.parser, data, base))
+
+    def _publish(self, batch, partial_results=None) -> int:
+        """Hand a parsed batch (or the partials of a parallel chunk) to the subscribers."""
+        for event in batch:
+            event["file_id"] = self._file_id
+
+        results = iter(partial_results or [])
+        for callback, partial, merge in self.subscribers:
+            try:
+                if partial is not None and partial_results is not None:
+                    merge(next(results))
+                elif batch:
+                    callback(batch)
+            except Exception as e:
+                print(f"Error in log subscriber {getattr(callback, '__name__', callback)}: {e}")
+        return len(batch)
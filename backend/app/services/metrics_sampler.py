@@ -0,0 +1,73 @@
+import time
+import threading
+from collections import deque
+
+
+class MetricsSampler:
+    """Background sampler keeping the latest system snapshot and a history.
+
+    One thread calls ``collect_fn`` every ``interval`` seconds. The full
+    result is kept as the latest sample, and a compact point built by
+    ``point_fn`` goes into a ring buffer of ``history_size`` entries, so
+    memory stays fixed however long the server runs. Readers never block
+    on psutil: they get the last sample as is.
+    """
+
+    def __init__(self, collect_fn, point_fn, interval: float = 2.0, history_size: int = 1800):
+        self.collect_fn = collect_fn
+        self.point_fn = point_fn
+        self.interval = interval
+        self.history_points = deque(maxlen=history_size)
+        self.sample = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self.collect()
+            # Jadwal tetap: waktu collect tidak menggeser interval
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def collect(self):
+        try:
+            sample = self.collect_fn()
+        except Exception as e:
+            print(f"Error sampling system metrics: {e}")
+            return None
+        point = self.point_fn(sample)
+        point["ts"] = time.time()
+        with self._lock:
+            self.sample = sample
+            self.history_points.append(point)
+        return sample
+
+    def latest(self):
+        """Most recent sample; collected on the spot if the thread has not run yet."""
+        with self._lock:
+            sample = self.sample
+        return sample if sample is not None else self.collect()
+
+    def history(self, seconds: float):
+        """Points of the last ``seconds``, oldest first."""
+        cutoff = time.time() - seconds
+        with self._lock:
+            points = list(self.history_points)
+        # Buffer urut waktu: cari dari belakang
+        i = len(points)
+        while i > 0 and points[i - 1]["ts"] >= cutoff:
+            i -= 1
+        return points[i:]
@@ -0,0 +1,145 @@
+import time
+import threading
+
+
+class ReloadScheduler:
+    """Coalesces bursts of config changes into a single Caddy reload.
+
+    ``request()`` only marks the config as dirty and returns immediately.
+    A background thread waits until no new request has arrived for
+    ``debounce_seconds`` (or until ``max_delay_seconds`` have passed since
+    the first pending request, so a steady stream of changes cannot
+    postpone the reload forever), then calls ``reload_fn`` once for the
+    whole burst. A request arriving while a reload is running schedules
+    another one, since the files may have changed after Caddy read them.
+
+    ``status()`` reports the outcome of the last reload plus counters and
+    latency figures for the dashboard.
+    """
+
+    def __init__(self, reload_fn, debounce_seconds: float = 1.0, max_delay_seconds: float = 10.0):
+        self.reload_fn = reload_fn
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+        # Generasi: requested naik tiap request, applied = generasi yang sudah di-reload
+        self._requested = 0
+        self._applied = 0
+        self._first_pending = None
+        self._last_request = None
+        self._running = False
+        self._force = False
+
+        self.reloads = 0
+        self.failures = 0
+        self.last_result = None
+        self.last_reload_at = None
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+        self.last_delay = 0.0
+
+    def request(self):
+        """Mark the config dirty; the reload happens in the background."""
+        with self._cond:
+            now = time.monotonic()
+            self._requested += 1
+            self._last_request = now
+            if self._first_pending is None:
+                self._first_pending = now
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="caddy-reload", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until every request made so far has been reloaded."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            target = self._requested
+            if self._applied < target:
+                # Lewati debounce: reload sekarang juga
+                self._force = True
+                self._cond.notify_all()
+            while self._applied < target:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout: float = 30.0):
+        """Apply any pending change, then end the worker thread."""
+        self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._applied < self._requested:
+                        now = time.monotonic()
+                        due = min(self._last_request + self.debounce_seconds,
+                                  self._first_pending + self.max_delay_seconds)
+                        if self._force or now >= due:
+                            break
+                        self._cond.wait(due - now)
+                    elif self._stopping:
+                        return
+                    else:
+                        self._cond.wait()
+                target = self._requested
+                delay = time.monotonic() - self._first_pending
+                self._first_pending = self._last_request = None
+                self._force = False
+                self._running = True
+
+            started = time.monotonic()
+            try:
+                result = self.reload_fn()
+            except Exception as e:
+                result = {"status": "error", "message": str(e)}
+            duration = time.monotonic() - started
+
+            with self._cond:
+                self._running = False
+                self._applied = target
+                self.reloads += 1
+                if result.get("status") == "error":
+                    self.failures += 1
+                self.last_result = result
+                self.last_reload_at = time.time()
+                self.last_duration = duration
+                self.max_duration = max(self.max_duration, duration)
+                self.total_duration += duration
+                self.last_delay = delay
+                self._cond.notify_all()
+
+    def status(self) -> dict:
+        with self._cond:
+            last = self.last_result or {}
+            return {
+                "pending": self._applied < self._requested,
+                "running": self._running,
+                "requests": self._requested,
+                "reloads": self.reloads,
+                # Request yang ikut reload orang lain
+                "coalesced": self._applied - self.reloads,
+                "failures": self.failures,
+                "last_status": last.get("status", "none"),
+                "last_message": last.get("message", ""),
+                "last_reload_at": self.last_reload_at,
+                "last_duration_ms": round(self.last_duration * 1000, 1),
+                "avg_duration_ms": round(self.total_duration / self.reloads * 1000, 1) if self.reloads else 0.0,
+                "max_duration_ms": round(self.max_duration * 1000, 1),
+                "last_delay_ms": round(self.last_delay * 1000, 1),
+            }
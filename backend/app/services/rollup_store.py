@@ -0,0 +1,231 @@
+import time
+import threading
+from app.services.hyperloglog import HyperLogLog, hash_key
+
+# Urutan kolom di setiap cell (list of int)
+ROLLUP_FIELDS = ["valid", "blocked", "sql_injection", "xss", "lfi", "rce", "bad_bots", "brute_force", "dos", "protocol"]
+FIELD_INDEX = {name: i for i, name in enumerate(ROLLUP_FIELDS)}
+
+# Resolusi yang dipakai dashboard (detik per bucket)
+RESOLUTIONS = {
+    "2m": 120,
+    "5m": 300,
+    "1h": 3600,
+    "3h": 3 * 3600,
+    "1d": 86400,
+}
+
+MINUTE = 60
+HOUR = 3600
+
+
+def empty_cell():
+    return [0] * len(ROLLUP_FIELDS)
+
+
+def merge_cell(target, cell):
+    for i, v in enumerate(cell):
+        target[i] += v
+
+
+def count_events(events):
+    """Per-minute cells and unique-IP sketches for a batch of parsed events.
+
+    Returns ``(cells, sketches)``: ``{minute_ts: cell}`` and
+    ``{minute_ts: [all_clients, blocked_clients]}`` HyperLogLogs. Pure
+    function, so a parallel backfill can run it inside the parse workers
+    and hand the partial result to RollupStore.merge.
+    """
+    cells = {}
+    sketches = {}
+    for event in events:
+        ts = int(event["ts"])
+        key = ts - ts % MINUTE
+        cell = cells.get(key)
+        if cell is None:
+            cell = cells[key] = empty_cell()
+            pair = sketches[key] = [HyperLogLog(), HyperLogLog()]
+        else:
+            pair = sketches[key]
+
+        h = hash_key(event["ip"])
+        pair[0].add_hash(h)
+        if event["blocked"]:
+            cell[1] += 1
+            pair[1].add_hash(h)
+            category = event.get("category")
+            if category in FIELD_INDEX:
+                cell[FIELD_INDEX[category]] += 1
+        else:
+            cell[0] += 1
+    return cells, sketches
+
+
+def merge_sketches(target, pair):
+    target[0].merge(pair[0])
+    target[1].merge(pair[1])
+
+
+class RollupStore:
+    """Per-minute traffic counters, filled once at ingest.
+
+    Each cell holds valid/blocked totals plus one counter per attack category.
+    Range queries merge minute cells into whatever bucket width the chart
+    needs (2m, 5m, 1h, 3h, 1d). Minute cells older than
+    ``minute_retention`` are compacted into hourly cells, and hourly cells
+    older than ``hour_retention`` are dropped, so memory stays bounded.
+
+    Unique clients and unique blocked clients are tracked with HyperLogLog
+    sketches per hour and, for the last ``sketch_retention`` seconds, per
+    minute. ``uniques`` merges them for any range.
+    """
+
+    def __init__(self, minute_retention: int = 7 * 86400, hour_retention: int = 90 * 86400, sketch_retention: int = 86400):
+        self.minute_retention = minute_retention
+        self.hour_retention = hour_retention
+        self.sketch_retention = sketch_retention
+        self.minutes = {}
+        self.hours = {}
+        # [all_clients, blocked_clients]: per menit (24 jam terakhir) dan per jam
+        self.minute_sketches = {}
+        self.hour_sketches = {}
+        # Semua minute cell < horizon sudah dipadatkan ke self.hours
+        self.horizon = 0
+        self._last_compact = 0
+        self._lock = threading.Lock()
+
+    # --- Ingest ---
+
+    def add_events(self, events):
+        """Tailer subscriber: count a batch of parsed events."""
+        self.merge(count_events(events))
+
+    def merge(self, partial):
+        """Add the minute cells and sketches produced by count_events."""
+        cells, sketches = partial
+        with self._lock:
+            for key, cell in cells.items():
+                if key >= self.horizon:
+                    target = self.minutes.get(key)
+                    if target is None:
+                        self.minutes[key] = cell
+                        continue
+                else:
+                    target = self.hours.setdefault(key - key % HOUR, empty_cell())
+                merge_cell(target, cell)
+
+            sketch_horizon = time.time() - self.sketch_retention
+            for key, pair in sketches.items():
+                hour = key - key % HOUR
+                target = self.hour_sketches.get(hour)
+                if target is None:
+                    target = self.hour_sketches[hour] = [HyperLogLog(), HyperLogLog()]
+                merge_sketches(target, pair)
+                if key >= sketch_horizon:
+                    target = self.minute_sketches.get(key)
+                    if target is None:
+                        self.minute_sketches[key] = pair
+                    else:
+                        merge_sketches(target, pair)
+
+            now = time.time()
+            if now - self._last_compact >= MINUTE:
+                self._compact(now)
+
+    def _compact(self, now):
+        self._last_compact = now
+
+        horizon = int(now - self.minute_retention)
+        horizon -= horizon % HOUR
+        if horizon > self.horizon:
+            for key in [k for k in self.minutes if k < horizon]:
+                cell = self.minutes.pop(key)
+                merge_cell(self.hours.setdefault(key - key % HOUR, empty_cell()), cell)
+            self.horizon = horizon
+
+        expiry = now - self.hour_retention
+        for key in [k for k in self.hours if k < expiry]:
+            del self.hours[key]
+        for key in [k for k in self.hour_sketches if k < expiry]:
+            del self.hour_sketches[key]
+
+        sketch_horizon = now - self.sketch_retention
+        for key in [k for k in self.minute_sketches if k < sketch_horizon]:
+            del self.minute_sketches[key]
+
+    # --- Queries ---
+
+    def _cells(self, start: int, end: int):
+        """Yield ``(ts, cell)`` for every non-empty cell in ``[start, end)``."""
+        horizon = self.horizon
+        if start < horizon:
+            first = start - start % HOUR
+            for key in range(first, min(end, horizon), HOUR):
+                cell = self.hours.get(key)
+                if cell is not None:
+                    yield max(key, start), cell
+
+        first = max(start, horizon)
+        first -= first % MINUTE
+        for key in range(first, end, MINUTE):
+            cell = self.minutes.get(key)
+            if cell is not None:
+                yield key, cell
+
+    def series(self, start: int, step: int, num_buckets: int):
+        """Totals for the whole window plus one merged cell per ``step`` bucket."""
+        end = start + step * num_buckets
+        totals = empty_cell()
+        buckets = [empty_cell() for _ in range(num_buckets)]
+
+        with self._lock:
+            for key, cell in self._cells(start, end):
+                merge_cell(totals, cell)
+                idx = (key - start) // step
+                if 0 <= idx < num_buckets:
+                    merge_cell(buckets[idx], cell)
+
+        return totals, buckets
+
+    def uniques(self, start: int, end: int):
+        """Estimated ``(unique_clients, unique_blocked_clients)`` in ``[start, end)``.
+
+        Whole hours come from the hourly sketches and the partial hours at
+        the edges from the minute sketches. Where those are gone, the
+        overlapping hour is used, which can only over-count.
+        """
+        total = [HyperLogLog(), HyperLogLog()]
+        first_hour = -(-start // HOUR) * HOUR
+        last_hour = end - end % HOUR
+        if first_hour < last_hour:
+            edges = [(start, first_hour), (last_hour, end)]
+        else:
+            edges = [(start, end)]
+            first_hour = last_hour = start
+
+        with self._lock:
+            for key in range(first_hour, last_hour, HOUR):
+                pair = self.hour_sketches.get(key)
+                if pair is not None:
+                    merge_sketches(total, pair)
+
+            sketch_horizon = time.time() - self.sketch_retention
+            for edge_start, edge_end in edges:
+                if edge_start >= edge_end:
+                    continue
+                if edge_start - edge_start % MINUTE < sketch_horizon:
+                    for key in range(edge_start - edge_start % HOUR, edge_end, HOUR):
+                        pair = self.hour_sketches.get(key)
+                        if pair is not None:
+                            merge_sketches(total, pair)
+                    continue
+                for key in range(edge_start - edge_start % MINUTE, edge_end, MINUTE):
+                    pair = self.minute_sketches.get(key)
+                    if pair is not None:
+                        merge_sketches(total, pair)
+
+        return total[0].count(), total[1].count()
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self.minutes) + len(self.hours)
@@ -0,0 +1,112 @@
+import re
+import time
+import heapq
+import threading
+import calendar
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+DURATION_PART = re.compile(r"(\d+)\s*([smhdw])")
+
+
+def parse_duration(text: str):
+    """Seconds for a ban duration like '24h', '7d' or '1d12h'; None = permanent."""
+    text = (text or "").strip().lower()
+    if not text or text == "permanent":
+        return None
+    parts = DURATION_PART.findall(text)
+    if not parts or DURATION_PART.sub("", text).strip():
+        return None
+    return sum(int(n) * DURATION_UNITS[unit] for n, unit in parts)
+
+
+def rule_deadline(created_at: str, duration: str):
+    """Unix time a rule expires (created_at is SQLite CURRENT_TIMESTAMP, UTC), or None."""
+    seconds = parse_duration(duration)
+    if seconds is None or not created_at:
+        return None
+    try:
+        created = calendar.timegm(time.strptime(created_at[:19], "%Y-%m-%d %H:%M:%S"))
+    except ValueError:
+        return None
+    return created + seconds
+
+
+class RuleExpiry:
+    """Expires time-limited IP rules at their deadline.
+
+    Keeps a min-heap of ``(deadline, ip)`` and a thread that sleeps until
+    the earliest deadline (or until an earlier one is scheduled), so the
+    table is never polled. Every rule due by then is handed to
+    ``expire_fn`` in one batch, which re-checks the rows and applies the
+    change with a single config sync. Entries left behind when a rule is
+    renewed or deleted are harmless: ``expire_fn`` ignores rules whose
+    current deadline has not passed.
+    """
+
+    def __init__(self, expire_fn):
+        self.expire_fn = expire_fn
+        self._heap = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self.expired = 0
+
+    def schedule(self, ip: str, deadline: float):
+        with self._cond:
+            heapq.heappush(self._heap, (deadline, ip))
+            if self._heap[0] == (deadline, ip):
+                # Deadline baru paling awal: bangunkan thread
+                self._cond.notify()
+
+    def load(self, rows):
+        """(Re)build the heap from ip_rules rows with ip, duration and created_at."""
+        heap = []
+        for row in rows:
+            deadline = rule_deadline(row["created_at"], row["duration"])
+            if deadline is not None:
+                heap.append((deadline, row["ip"]))
+        heapq.heapify(heap)
+        with self._cond:
+            self._heap = heap
+            self._cond.notify()
+
+    def next_deadline(self):
+        with self._cond:
+            return self._heap[0][0] if self._heap else None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="rule-expiry", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    if self._heap:
+                        wait = self._heap[0][0] - time.time()
+                        if wait <= 0:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+                if self._stopping:
+                    return
+                now = time.time()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap)[1])
+
+            try:
+                self.expired += self.expire_fn(sorted(set(due)))
+            except Exception as e:
+                print(f"Error expiring IP rules: {e}")
@@ -0,0 +1,75 @@
+import time
+import threading
+import subprocess
+
+SHOW_PROPERTIES = "Id,LoadState,ActiveState,SubState,MainPID"
+
+
+def parse_systemctl_show(output: str, units):
+    """Map each unit to its properties from one ``systemctl show`` of many units.
+
+    systemctl prints one block of ``Key=Value`` lines per unit, in argument
+    order, separated by blank lines.
+    """
+    blocks = [b for b in output.strip().split("\n\n") if b.strip()]
+    states = {}
+    for unit, block in zip(units, blocks):
+        props = {}
+        for line in block.splitlines():
+            key, _, value = line.partition("=")
+            props[key] = value
+        states[unit] = props
+    return states
+
+
+class ServiceStatusProvider:
+    """Cached state of the monitored systemd units.
+
+    All units are queried with a single ``systemctl show`` (one fork,
+    however many services are monitored) and the result is kept for
+    ``ttl`` seconds. ``states()`` is called from the metrics sampler
+    thread, so API requests only ever read the cached copy; while one
+    refresh is running, other callers get the previous result instead of
+    waiting.
+    """
+
+    def __init__(self, units, ttl: float = 10.0):
+        self.units = list(units)
+        self.ttl = ttl
+        self._states = {}
+        self._updated = 0.0
+        self._error = None
+        self._refreshing = threading.Lock()
+
+    def states(self) -> dict:
+        if time.monotonic() - self._updated >= self.ttl and self._refreshing.acquire(blocking=False):
+            try:
+                self._states = self._query()
+                self._updated = time.monotonic()
+            finally:
+                self._refreshing.release()
+        return self._states
+
+    def invalidate(self):
+        """Force a refresh on the next call (e.g. after start/stop from the panel)."""
+        self._updated = 0.0
+
+    def _query(self) -> dict:
+        try:
+            res = subprocess.run(
+                ["systemctl", "show", "--property", SHOW_PROPERTIES, *self.units],
+                capture_output=True, text=True, timeout=5,
+            )
+        except (FileNotFoundError, subprocess.TimeoutExpired) as e:
+            return self._failed(str(e))
+        if res.returncode != 0:
+            return self._failed(res.stderr.strip())
+        self._error = None
+        return parse_systemctl_show(res.stdout, self.units)
+
+    def _failed(self, error: str) -> dict:
+        # Cukup sekali di log selama errornya sama (misal tanpa systemd)
+        if error != self._error:
+            print(f"Error querying service status: {error}")
+        self._error = error
+        return {}
@@ -5,9 +5,20 @@ import psutil
 import time
 import json
 import re
+import ipaddress
+import threading
 from datetime import datetime, timedelta
+from functools import lru_cache
 from app.core.config import get_settings
 from app.db import get_db_connection
+from app.services.ip_matcher import IpRuleMatcher, aggregate_deny_networks
+from app.services.geoip import get_geoip
+from app.services.reload_scheduler import ReloadScheduler
+from app.services.config_writer import write_config
+from app.services.rule_expiry import RuleExpiry, parse_duration, rule_deadline
+from app.services.metrics_sampler import MetricsSampler
+from app.services.service_status import ServiceStatusProvider
+from app.services.event_store import CHECKPOINT_KEY
 
 settings = get_settings()
 
@@ -32,7 +43,42 @@ else:
     CUSTOM_RULES_FILE = "/etc/caddy/custom_rules.conf"
     HOTLINK_CADDY_FILE = "/etc/caddy/hotlink.caddy"
 
+# Upsert: rule yang sudah ada diperbarui dan masa berlakunya dihitung ulang
+UPSERT_IP_RULE_SQL = """
+    INSERT INTO ip_rules (ip, action, note, duration, region) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(ip) DO UPDATE SET
+        action = excluded.action, note = excluded.note, duration = excluded.duration,
+        region = excluded.region, status = 'Active', created_at = CURRENT_TIMESTAMP
+"""
+
+# Matcher ip_rules yang di-cache; generation naik tiap kali tabel ditulis
+_rule_matcher = {"generation": 0, "built": None, "matcher": None}
+_rule_matcher_lock = threading.Lock()
+
+# psutil.Process per PID service; cpu_percent() dihitung dari sample sebelumnya
+_service_processes = {}
+
+# Counter per NIC dari sample sebelumnya, untuk menghitung rate
+_last_net = {"ts": None, "counters": {}}
+
+# Kode state di /proc/net/tcp -> nama state (sama dengan psutil)
+TCP_STATES = {
+    "01": "ESTABLISHED", "02": "SYN_SENT", "03": "SYN_RECV", "04": "FIN_WAIT1",
+    "05": "FIN_WAIT2", "06": "TIME_WAIT", "07": "CLOSE", "08": "CLOSE_WAIT",
+    "09": "LAST_ACK", "0A": "LISTEN", "0B": "CLOSING",
+}
+
+# Jumlah range per baris remote_ip di ip_filter
+REMOTE_IP_PER_LINE = 64
+
 # --- Static Definitions ---
+# Service yang dimonitor di Server Monitor (unit = nama unit systemd)
+MONITORED_SERVICES = [
+    {"id": "caddy", "unit": "caddy", "label": "Caddy Web Server"},
+    {"id": "crs", "unit": "caddy", "label": "Protection Rules (OWASP CRS)"},  # Coraza jalan di dalam Caddy
+    {"id": "sshd", "unit": "sshd", "label": "SSH Service"},
+]
+
 WAF_RULES_DB = [
     {"id": "SQL-01", "name": "SQL Injection", "desc": "Blocks common SQL injection vectors (OWASP A03)", "category": "Injection", "enabled": True},
     {"id": "XSS-02", "name": "Cross-Site Scripting (XSS)", "desc": "Filters malicious scripts in headers and body parameters (OWASP A07)", "category": "Injection", "enabled": True},
@@ -61,68 +107,101 @@ def restart_caddy():
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@lru_cache()
+def get_reload_scheduler() -> ReloadScheduler:
+    """Background reload shared by every config writer"""
+    return ReloadScheduler(
+        restart_caddy,
+        debounce_seconds=settings.CADDY_RELOAD_DEBOUNCE_SECONDS,
+        max_delay_seconds=settings.CADDY_RELOAD_MAX_DELAY_SECONDS,
+    )
+
+def schedule_caddy_reload():
+    """Queue a Caddy reload; bursts of changes are applied with one reload"""
+    get_reload_scheduler().request()
+
+def get_reload_status():
+    return get_reload_scheduler().status()
+
 def sync_ip_rules_file():
-    """Generates Nginx config file from DB"""
+    """Generates the Caddy ip_filter snippet from DB.
+
+    Deny rules are aggregated into the minimal set of CIDRs (allow rules
+    carved out) and written several ranges per remote_ip line. Returns
+    {"rules": n, "ranges": m, "changed": bool}; changed is False when the
+    file already had this content and no reload is needed.
+    """
     try:
         with get_db_connection() as conn:
-            rows = conn.execute("SELECT * FROM ip_rules WHERE status = 'Active'").fetchall()
-        
-        # Ensure dir exists (hanya jika path-nya absolut)
-        if os.path.isabs(IP_RULES_FILE):
-            os.makedirs(os.path.dirname(IP_RULES_FILE), exist_ok=True)
-        
-        with open(IP_RULES_FILE, "w") as f:
-            f.write(f"# Auto-generated from WAF GUI DB at {datetime.now()}\n")
-            f.write("# Do not edit manually.\n\n")
-            
-            # Caddy format:
-            # (ip_filter) {
-            #   @denied {
-            #     remote_ip 1.2.3.4
-            #   }
-            #   respond @denied 403
-            # }
-            
-            denied_ips = [r['ip'] for r in rows if r['action'] == 'deny']
-            
-            if denied_ips:
-                f.write("(ip_filter) {\n")
-                f.write("    @denied_ips {\n")
-                for ip in denied_ips:
-                    f.write(f"        remote_ip {ip}\n")
-                f.write("    }\n")
-                f.write("    respond @denied_ips 403\n")
-                f.write("}\n")
-            else:
-                f.write("(ip_filter) {\n    # No rules active\n}\n")
+            rows = conn.execute("SELECT ip, action FROM ip_rules WHERE status = 'Active'").fetchall()
+
+        denied = sum(1 for r in rows if r['action'] == 'deny')
+        ranges = [str(n) for n in aggregate_deny_networks(rows)] if denied else []
+
+        lines = [
+            "# Auto-generated from WAF GUI DB",
+            "# Do not edit manually.",
+            f"# {denied} deny rules aggregated into {len(ranges)} ranges",
+            "",
+        ]
+        # Caddy format:
+        # (ip_filter) {
+        #   @denied {
+        #     remote_ip 1.2.3.0/24 5.6.7.8/32 ...
+        #   }
+        #   respond @denied 403
+        # }
+        if ranges:
+            lines.append("(ip_filter) {")
+            lines.append("    @denied_ips {")
+            for i in range(0, len(ranges), REMOTE_IP_PER_LINE):
+                lines.append(f"        remote_ip {' '.join(ranges[i:i + REMOTE_IP_PER_LINE])}")
+            lines.append("    }")
+            lines.append("    respond @denied_ips 403")
+            lines.append("}")
+        else:
+            lines.append("(ip_filter) {\n    # No rules active\n}")
+
+        changed = write_config(IP_RULES_FILE, "\n".join(lines) + "\n")
+        if denied and changed:
+            # Allow di dalam CIDR deny bisa memecah range jadi lebih banyak
+            shrink = f" ({(denied - len(ranges)) * 100 // denied}% smaller)" if len(ranges) < denied else ""
+            print(f"IP rules: {denied} deny rules -> {len(ranges)} ranges{shrink}")
+        return {"rules": denied, "ranges": len(ranges), "changed": changed}
     except Exception as e:
         print(f"Error syncing IP rules: {e}")
+        return None
+
+def apply_ip_rules():
+    """Regenerate the ip_filter snippet and queue a reload only if it changed"""
+    synced = sync_ip_rules_file()
+    if synced and synced["changed"]:
+        schedule_caddy_reload()
+    return synced
 
 def sync_exclusions_file():
-    """Generates WAF exclusions file from DB"""
+    """Generates WAF exclusions file from DB. Returns True if the file changed."""
     try:
         with get_db_connection() as conn:
-            rows = conn.execute("SELECT rule_id FROM waf_rule_toggles WHERE enabled = 0").fetchall()
+            rows = conn.execute("SELECT rule_id FROM waf_rule_toggles WHERE enabled = 0 ORDER BY rule_id").fetchall()
         
         disabled_ids = [r['rule_id'] for r in rows]
         
-        if os.path.isabs(EXCLUSION_FILE):
-            os.makedirs(os.path.dirname(EXCLUSION_FILE), exist_ok=True)
-        
-        with open(EXCLUSION_FILE, "w") as f:
-            f.write(f"# Auto-generated WAF Exclusions at {datetime.now()}\n")
-            for rule_id in disabled_ids:
-                # Mapping ID Internal dashboard ke ID OWASP CRS (Jika perlu mapping khusus)
-                # Disini kita asumsikan ID di DB (misal 942000) sudah sesuai CRS
-                # Tapi karena di WAF_RULES_DB ID-nya string teks (SQL-01), kita perlu logic mapping
-                # Sesuai diskusi sebelumnya, kita pakai ID generik atau list ID CRS
-                # Untuk prototype ini, kita tulis comment saja dulu jika ID nya bukan angka
-                if rule_id.isdigit():
-                    f.write(f"SecRuleRemoveById {rule_id}\n")
-                else:
-                    f.write(f"# Rule {rule_id} disabled (Manual config required for named groups)\n")
+        lines = ["# Auto-generated WAF Exclusions"]
+        for rule_id in disabled_ids:
+            # Mapping ID Internal dashboard ke ID OWASP CRS (Jika perlu mapping khusus)
+            # Disini kita asumsikan ID di DB (misal 942000) sudah sesuai CRS
+            # Tapi karena di WAF_RULES_DB ID-nya string teks (SQL-01), kita perlu logic mapping
+            # Sesuai diskusi sebelumnya, kita pakai ID generik atau list ID CRS
+            # Untuk prototype ini, kita tulis comment saja dulu jika ID nya bukan angka
+            if rule_id.isdigit():
+                lines.append(f"SecRuleRemoveById {rule_id}")
+            else:
+                lines.append(f"# Rule {rule_id} disabled (Manual config required for named groups)")
+        return write_config(EXCLUSION_FILE, "\n".join(lines) + "\n")
     except Exception as e:
         print(f"Error syncing exclusions: {e}")
+        return False
 
 # --- Service Functions ---
 
@@ -140,7 +219,7 @@ def add_waf_rule(ip_address: str, action: str, note: str = "", duration: str = "
             if cursor.fetchone():
                 return {"status": "error", "message": f"Rule for {ip_address} already exists"}
             
-            region = "Local" # Di real app bisa pakai GeoIP library
+            region = get_geoip().region(ip_address)
             
             cursor.execute(
                 "INSERT INTO ip_rules (ip, action, note, duration, region) VALUES (?, ?, ?, ?, ?)",
@@ -148,8 +227,9 @@ def add_waf_rule(ip_address: str, action: str, note: str = "", duration: str = "
             )
             conn.commit()
             
-        sync_ip_rules_file()
-        restart_caddy()
+        invalidate_rule_matcher()
+        schedule_rule_expiry(ip_address, duration)
+        apply_ip_rules()
         return {"status": "success", "message": f"Rule added for {ip_address}"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -159,6 +239,28 @@ def get_ip_rules():
         rows = conn.execute("SELECT * FROM ip_rules ORDER BY created_at DESC").fetchall()
     return [dict(r) for r in rows]
 
+def get_rule_matcher() -> IpRuleMatcher:
+    """Compiled CIDR matcher over the active ip_rules.
+
+    Cached until the table changes: every writer calls invalidate_rule_matcher()
+    after its commit. A matcher whose build overlapped such a write may hold
+    the old rows, so it is returned but not cached.
+    """
+    with _rule_matcher_lock:
+        generation = _rule_matcher["generation"]
+        if _rule_matcher["built"] == generation:
+            return _rule_matcher["matcher"]
+    matcher = IpRuleMatcher([r for r in get_ip_rules() if r['status'] == 'Active'])
+    with _rule_matcher_lock:
+        if _rule_matcher["generation"] == generation:
+            _rule_matcher["matcher"] = matcher
+            _rule_matcher["built"] = generation
+    return matcher
+
+def invalidate_rule_matcher():
+    with _rule_matcher_lock:
+        _rule_matcher["generation"] += 1
+
 def delete_ip_rule(ip_address: str):
     try:
         with get_db_connection() as conn:
@@ -168,12 +270,233 @@ def delete_ip_rule(ip_address: str):
                 return {"status": "error", "message": "IP Rule not found"}
             conn.commit()
             
-        sync_ip_rules_file()
-        restart_caddy()
+        invalidate_rule_matcher()
+        apply_ip_rules()
         return {"status": "success", "message": f"Rule removed for {ip_address}"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+def parse_ip_rule_import(data: str, fmt: str = "auto"):
+    """Rule dicts from a JSON, CSV or plain-text (one IP/CIDR per line) upload."""
+    text = data.lstrip("\ufeff").strip()
+    if fmt == "auto":
+        if text[:1] in ("[", "{"):
+            fmt = "json"
+        elif "," in text.split("\n", 1)[0]:
+            fmt = "csv"
+        else:
+            fmt = "txt"
+
+    if fmt == "json":
+        items = json.loads(text) if text else []
+        if isinstance(items, dict):
+            items = items.get("rules", [])
+        if not isinstance(items, list):
+            raise ValueError("expected a list of rules")
+        for item in items:
+            yield {"ip": item} if isinstance(item, str) else item
+    elif fmt == "csv":
+        import csv
+        import io
+        reader = csv.reader(io.StringIO(text))
+        header = next(reader, [])
+        columns = [c.strip().lower() for c in header]
+        if "ip" not in columns:
+            # Tanpa header: kolom pertama IP
+            columns = ["ip", "action", "note", "duration"]
+            reader = csv.reader(io.StringIO(text))
+        for rec in reader:
+            if rec:
+                yield dict(zip(columns, rec))
+    else:
+        for line in text.splitlines():
+            # Format threat feed: "1.2.3.0/24 ; SBL123" atau "1.2.3.4 # komentar"
+            line = re.split(r"[#;]", line, 1)[0].strip()
+            if line:
+                yield {"ip": line.split()[0]}
+
+def valid_rule_duration(duration) -> bool:
+    """'Permanent' or a duration parse_duration understands ('24h', '7d', ...)"""
+    if not isinstance(duration, str):
+        return False
+    return duration.strip().lower() == "permanent" or parse_duration(duration) is not None
+
+def import_ip_rules(data: str, fmt: str = "auto", action: str = "deny", note: str = "", duration: str = "Permanent"):
+    """Validate and upsert many IP rules in one transaction, then sync and reload once"""
+    if action not in ["deny", "allow"]:
+        return {"status": "error", "message": "Action must be 'deny' or 'allow'"}
+    if fmt not in ["auto", "json", "csv", "txt"]:
+        return {"status": "error", "message": "Format must be 'auto', 'json', 'csv' or 'txt'"}
+
+    try:
+        items = list(parse_ip_rule_import(data, fmt))
+    except (ValueError, TypeError, AttributeError) as e:
+        return {"status": "error", "message": f"Invalid {fmt} upload: {e}"}
+
+    if not valid_rule_duration(duration):
+        return {"status": "error", "message": f"Invalid duration '{duration}'"}
+
+    rules = {}
+    errors = []
+    geoip = get_geoip()
+    for n, item in enumerate(items, 1):
+        if not isinstance(item, dict):
+            errors.append(f"#{n}: expected an IP or an object, got {type(item).__name__}")
+            continue
+        bad = [f for f in ("ip", "action", "note", "duration") if item.get(f) is not None and not isinstance(item[f], str)]
+        if bad:
+            errors.append(f"#{n}: {', '.join(bad)} must be text")
+            continue
+        raw = (item.get("ip") or "").strip()
+        rule_action = (item.get("action") or action).strip().lower()
+        rule_duration = (item.get("duration") or duration).strip()
+        try:
+            network = ipaddress.ip_network(raw, strict=False)
+        except ValueError:
+            errors.append(f"#{n}: invalid IP/CIDR '{raw}'")
+            continue
+        if rule_action not in ["deny", "allow"]:
+            errors.append(f"#{n}: invalid action '{rule_action}'")
+            continue
+        if not valid_rule_duration(rule_duration):
+            errors.append(f"#{n}: invalid duration '{rule_duration}'")
+            continue
+        # Host tunggal disimpan tanpa /32 seperti rule yang diinput manual
+        ip = str(network.network_address) if network.num_addresses == 1 else str(network)
+        rules[ip] = (
+            ip,
+            rule_action,
+            item.get("note") or note,
+            rule_duration,
+            geoip.region(ip),
+        )
+
+    if not rules:
+        return {"status": "error", "message": "No valid IP rules found", "imported": 0, "updated": 0, "invalid": len(errors), "errors": errors[:20]}
+
+    try:
+        with get_db_connection() as conn:
+            # Hanya IP yang diimport yang dicek, bukan seluruh tabel
+            ips = list(rules)
+            existing = set()
+            for i in range(0, len(ips), 500):
+                chunk = ips[i:i + 500]
+                existing.update(r[0] for r in conn.execute(
+                    f"SELECT ip FROM ip_rules WHERE ip IN ({','.join('?' * len(chunk))})", chunk
+                ))
+            conn.executemany(UPSERT_IP_RULE_SQL, rules.values())
+            conn.commit()
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+    # Rule sudah tersimpan: file Caddy tetap harus disinkronkan walaupun penjadwalan gagal
+    try:
+        invalidate_rule_matcher()
+        for ip, _, _, rule_duration, _ in rules.values():
+            schedule_rule_expiry(ip, rule_duration)
+    finally:
+        synced = apply_ip_rules()
+
+    updated = len(existing.intersection(rules))
+    summary = f"Imported {len(rules)} IP rules ({len(rules) - updated} new, {updated} updated, {len(errors)} invalid)"
+    if synced:
+        summary += f"; {synced['rules']} deny rules written as {synced['ranges']} ranges"
+    return {
+        "status": "success",
+        "message": summary,
+        "imported": len(rules) - updated,
+        "updated": updated,
+        "invalid": len(errors),
+        "errors": errors[:20],
+    }
+
+def export_ip_rules(fmt: str = "csv"):
+    """Streams every IP rule as CSV, JSON or plain text, one row at a time"""
+    columns = ["ip", "action", "note", "duration", "region", "status", "created_at"]
+    with get_db_connection() as conn:
+        cursor = conn.execute(f"SELECT {', '.join(columns)} FROM ip_rules ORDER BY id")
+        if fmt == "json":
+            yield "["
+            first = True
+            for row in cursor:
+                yield ("" if first else ",") + "\n" + json.dumps(dict(row))
+                first = False
+            yield "\n]\n"
+        elif fmt == "txt":
+            for row in cursor:
+                yield f"{row['ip']}\n"
+        else:
+            import csv
+            import io
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            for row in cursor:
+                writer.writerow(tuple(row))
+                if buffer.tell() > 65536:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+
+def auto_ban_ips(ips, note: str, duration: str):
+    """Deny ``ips`` found by the auto-ban engine in one transaction and one sync.
+
+    IPs already covered by any rule (an allow exception or an existing
+    deny) are left alone. Returns the number of new bans.
+    """
+    matcher = get_rule_matcher()
+    geoip = get_geoip()
+    rules = [(ip, "deny", note, duration, geoip.region(ip)) for ip in ips if matcher.match(ip) is None]
+    if not rules:
+        return 0
+
+    with get_db_connection() as conn:
+        conn.executemany(UPSERT_IP_RULE_SQL, rules)
+        conn.commit()
+
+    print(f"Auto-ban: blocked {len(rules)} IPs ({', '.join(r[0] for r in rules[:5])}{'...' if len(rules) > 5 else ''})")
+    invalidate_rule_matcher()
+    for rule in rules:
+        schedule_rule_expiry(rule[0], duration)
+    apply_ip_rules()
+    return len(rules)
+
+@lru_cache()
+def get_rule_expiry() -> RuleExpiry:
+    """Expiry timer for temporary bans, loaded from ip_rules on first use"""
+    expiry = RuleExpiry(expire_ip_rules)
+    with get_db_connection() as conn:
+        expiry.load(conn.execute("SELECT ip, duration, created_at FROM ip_rules WHERE duration != 'Permanent'").fetchall())
+    return expiry
+
+def schedule_rule_expiry(ip_address: str, duration: str):
+    seconds = parse_duration(duration)
+    if seconds is not None:
+        get_rule_expiry().schedule(ip_address, time.time() + seconds)
+
+def expire_ip_rules(ips):
+    """Delete the rules in ``ips`` whose duration has run out; one sync for the batch"""
+    now = time.time()
+    expired = []
+    with get_db_connection() as conn:
+        for i in range(0, len(ips), 500):
+            chunk = ips[i:i + 500]
+            rows = conn.execute(
+                f"SELECT ip, duration, created_at FROM ip_rules WHERE ip IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            # Rule yang sudah diperpanjang/dihapus sejak dijadwalkan dilewati
+            expired.extend(r['ip'] for r in rows if (rule_deadline(r['created_at'], r['duration']) or now + 1) <= now)
+        if expired:
+            conn.executemany("DELETE FROM ip_rules WHERE ip = ?", ((ip,) for ip in expired))
+            conn.commit()
+
+    if expired:
+        print(f"Expired {len(expired)} temporary IP rules")
+        invalidate_rule_matcher()
+        apply_ip_rules()
+    return len(expired)
+
 def get_waf_rules():
     rules = [r.copy() for r in WAF_RULES_DB]
     with get_db_connection() as conn:
@@ -199,8 +522,8 @@ def toggle_rule(rule_id: str, enable: bool):
             )
             conn.commit()
             
-        sync_exclusions_file()
-        restart_caddy()
+        if sync_exclusions_file():
+            schedule_caddy_reload()
         
         status_msg = "Enabled" if enable else "Disabled"
         return {"status": "success", "message": f"Rule {rule['name']} is now {status_msg}"}
@@ -261,13 +584,8 @@ def save_hotlink_config(config: dict):
     respond @hotlink 403
 }}
 """
-        if os.path.isabs(HOTLINK_CADDY_FILE):
-             os.makedirs(os.path.dirname(HOTLINK_CADDY_FILE), exist_ok=True)
-
-        with open(HOTLINK_CADDY_FILE, "w") as f:
-            f.write(caddy_conf)
-
-        restart_caddy()
+        if write_config(HOTLINK_CADDY_FILE, caddy_conf):
+            schedule_caddy_reload()
         return {"status": "success", "message": "Hotlink configuration saved and applied."}
         
     except Exception as e:
@@ -281,11 +599,8 @@ def get_custom_rules():
 
 def save_custom_rules(content: str):
     try:
-        if os.path.isabs(CUSTOM_RULES_FILE):
-            os.makedirs(os.path.dirname(CUSTOM_RULES_FILE), exist_ok=True)
-        with open(CUSTOM_RULES_FILE, "w") as f:
-            f.write(content)
-        restart_caddy()
+        if write_config(CUSTOM_RULES_FILE, content):
+            schedule_caddy_reload()
         return {"status": "success", "message": "Custom rules saved and applied."}
     except Exception as e:
          return {"status": "error", "message": f"Failed to save rules: {str(e)}"}
@@ -331,6 +646,7 @@ def manage_service(service_name: str, action: str):
         else:
             cmd = ["sudo", "/usr/bin/systemctl", action, sys_name]
             subprocess.run(cmd, check=True)
+            get_service_status_provider().invalidate()
             return {"status": "success", "message": f"Service {sys_name} {action}ed successfully."}
             
     except subprocess.CalledProcessError as e:
@@ -338,14 +654,12 @@ def manage_service(service_name: str, action: str):
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@lru_cache()
+def get_service_status_provider() -> ServiceStatusProvider:
+    """One cached systemctl query for every monitored unit"""
+    return ServiceStatusProvider(sorted({svc["unit"] for svc in MONITORED_SERVICES}), ttl=settings.SERVICE_STATUS_TTL)
+
 def get_services_status():
-    # Service yang mau dimonitor
-    target_services = [
-        {"name": "caddy", "label": "Caddy Web Server"},
-        {"name": "modsec_crs", "label": "Protection Rules (OWASP CRS)"},
-        {"name": "sshd", "label": "SSH Service"}
-    ]
-    
     results = []
     
     # Windows Fallback
@@ -356,77 +670,116 @@ def get_services_status():
             {"id": "ssh", "name": "SSH Service", "status": "Active", "pid": "892", "cpu": "0.1%", "uptime": "45d"},
         ]
 
-    for svc in target_services:
-        s_name = svc["name"]
+    # Satu panggilan systemctl (di-cache) untuk semua service
+    states = get_service_status_provider().states()
+
+    for svc in MONITORED_SERVICES:
+        state = states.get(svc["unit"])
         
         # Logika khusus untuk CRS (karena dia bukan service beneran, tapi nempel di Caddy)
-        if s_name == "modsec_crs":
-             item = {
+        if svc["id"] == "crs":
+            item = {
                 "id": "crs",
                 "name": svc["label"],
-                "status": "Active",
+                "status": "Active" if state and state.get("ActiveState") == "active" else "Inactive",
                 "pid": "-", "cpu": "-", "uptime": "-"
-             }
-             # Cek apakah caddy aktif
-             res = subprocess.run(["systemctl", "is-active", "caddy"], capture_output=True, text=True)
-             if res.returncode != 0:
-                 item["status"] = "Inactive"
-             
-             results.append(item)
-             continue
-
-        # Logic standard untuk service systemd (caddy, sshd)
-        real_svc_name = "sshd" if s_name == "sshd" else s_name
-        
+            }
+            results.append(item)
+            continue
+
         item = {
-            "id": svc["name"],
+            "id": svc["id"],
             "name": svc["label"],
             "status": "Inactive",
             "pid": "-",
             "cpu": "0%",
             "uptime": "-"
         }
-        
-        try:
-            # 1. Cek Status
-            res = subprocess.run(["systemctl", "is-active", real_svc_name], capture_output=True, text=True)
-            if res.returncode == 0 and res.stdout.strip() == "active":
-                item["status"] = "Active"
-                
-                # 2. Ambil PID
-                res_pid = subprocess.run(["systemctl", "show", "--property", "MainPID", "--value", real_svc_name], capture_output=True, text=True)
-                pid_str = res_pid.stdout.strip()
-                
-                if pid_str and pid_str != "0":
-                    pid = str(pid_str)
-                    item["pid"] = pid
-                    try:
-                        # 3. Ambil CPU & Uptime via PSUTIL
-                        p = psutil.Process(int(pid_str))
-                        item["cpu"] = f"{p.cpu_percent(interval=0.1)}%" # Interval kecil agar tidak blocking
-                        
-                        create_time = datetime.fromtimestamp(p.create_time())
-                        uptime_duration = datetime.now() - create_time
-                        
-                        days = uptime_duration.days
-                        hours = uptime_duration.seconds // 3600
-                        item["uptime"] = f"{days}d {hours}h"
-                    except:
-                        pass
-            elif res.stdout.strip() == "failed":
-                item["status"] = "Failed"
-            else:
-                 item["status"] = "Stopped"
-                 
-        except Exception:
+
+        if state is None:
             item["status"] = "Unknown"
+        elif state.get("ActiveState") == "active":
+            item["status"] = "Active"
+            pid_str = state.get("MainPID", "0")
+            
+            if pid_str and pid_str != "0":
+                item["pid"] = pid_str
+                try:
+                    # CPU & Uptime via PSUTIL (tanpa sleep: selisih sejak sample lalu)
+                    p = _service_processes.get(pid_str)
+                    if p is None or not p.is_running():
+                        p = _service_processes[pid_str] = psutil.Process(int(pid_str))
+                    item["cpu"] = f"{p.cpu_percent(interval=None)}%"
+                    
+                    create_time = datetime.fromtimestamp(p.create_time())
+                    uptime_duration = datetime.now() - create_time
+                    
+                    days = uptime_duration.days
+                    hours = uptime_duration.seconds // 3600
+                    item["uptime"] = f"{days}d {hours}h"
+                except (psutil.Error, ValueError):
+                    pass
+        elif state.get("ActiveState") == "failed":
+            item["status"] = "Failed"
+        else:
+            item["status"] = "Stopped"
             
         results.append(item)
         
     return results
 
-def get_system_health():
-    """Mengambil data real hardware menggunakan psutil"""
+def sample_interfaces():
+    """Per-NIC bytes/s and packets/s since the previous call (0 on the first)"""
+    now = time.monotonic()
+    counters = psutil.net_io_counters(pernic=True)
+    last_ts, last = _last_net["ts"], _last_net["counters"]
+    elapsed = now - last_ts if last_ts else 0
+    _last_net["ts"], _last_net["counters"] = now, counters
+
+    def rate(cur, prev):
+        # Counter bisa reset (interface restart): anggap 0
+        return round(max(cur - prev, 0) / elapsed, 1) if elapsed > 0 else 0.0
+
+    interfaces = []
+    for name, c in sorted(counters.items()):
+        p = last.get(name, c)
+        interfaces.append({
+            "name": name,
+            "rx_bytes_s": rate(c.bytes_recv, p.bytes_recv),
+            "tx_bytes_s": rate(c.bytes_sent, p.bytes_sent),
+            "rx_packets_s": rate(c.packets_recv, p.packets_recv),
+            "tx_packets_s": rate(c.packets_sent, p.packets_sent),
+        })
+    return interfaces
+
+def count_tcp_states():
+    """TCP connection count per state.
+
+    Reads /proc/net/tcp{,6} directly on Linux: psutil.net_connections()
+    also maps every socket to its process by scanning /proc/*/fd, which is
+    far too slow to run every few seconds during a flood.
+    """
+    counts = {}
+    if os.path.exists("/proc/net/tcp"):
+        for path in ("/proc/net/tcp", "/proc/net/tcp6"):
+            try:
+                with open(path) as f:
+                    next(f, None)
+                    for line in f:
+                        state = TCP_STATES.get(line.split(None, 4)[3], "UNKNOWN")
+                        counts[state] = counts.get(state, 0) + 1
+            except OSError:
+                pass
+        return counts
+    try:
+        for conn in psutil.net_connections(kind="tcp"):
+            counts[conn.status] = counts.get(conn.status, 0) + 1
+    except (psutil.AccessDenied, OSError):
+        pass
+    return counts
+
+def collect_system_health():
+    """Mengambil data real hardware menggunakan psutil (dipanggil oleh sampler)"""
     if os.name == 'nt':
         # Data dummy untuk Windows (karena loadavg ga ada di windows)
         return {
@@ -436,6 +789,8 @@ def get_system_health():
             "disk_usage": {"used_percent": 45, "path": "C:/"},
             "load_avg": 0.5,
             "network": {"in": 100, "out": 200},
+            "interfaces": [],
+            "tcp_states": {},
             "services": get_services_status()
         }
 
@@ -444,8 +799,8 @@ def get_system_health():
     ram_gb = round(mem.total / (1024**3), 2)
     used_gb = round(mem.used / (1024**3), 2)
     
-    # 2. CPU
-    cpu_usage = psutil.cpu_percent(interval=0.5)
+    # 2. CPU (rata-rata sejak sample sebelumnya, tanpa blocking)
+    cpu_usage = psutil.cpu_percent(interval=None)
     
     # 3. Disk
     disk = psutil.disk_usage('/')
@@ -461,11 +816,11 @@ def get_system_health():
     uptime_sec = datetime.now() - boot_time
     uptime_str = f"{uptime_sec.days}d {uptime_sec.seconds // 3600}h"
     
-    # 6. Network
-    net = psutil.net_io_counters()
-    # Konversi ke KB untuk display
-    net_in = round(net.bytes_recv / 1024, 2)
-    net_out = round(net.bytes_sent / 1024, 2)
+    # 6. Network: rate per NIC sejak sample sebelumnya, total dalam Mbps (tanpa loopback)
+    interfaces = sample_interfaces()
+    net_in = round(sum(i["rx_bytes_s"] for i in interfaces if i["name"] != "lo") * 8 / 1e6, 2)
+    net_out = round(sum(i["tx_bytes_s"] for i in interfaces if i["name"] != "lo") * 8 / 1e6, 2)
+    tcp_states = count_tcp_states()
     
     services = get_services_status()
     
@@ -480,9 +835,44 @@ def get_system_health():
         "disk_usage": {"used_percent": disk.percent, "path": "/"},
         "load_avg": round(load_avg, 2),
         "network": {"in": net_in, "out": net_out},
+        "interfaces": interfaces,
+        "tcp_states": tcp_states,
         "services": services
     }
 
+def health_point(sample: dict) -> dict:
+    """Compact history entry for the sparklines"""
+    return {
+        "cpu": sample["cpu_usage"],
+        "ram": sample["ram_usage"]["percent"],
+        "disk": sample["disk_usage"]["used_percent"],
+        "load": sample["load_avg"],
+        "net_in": sample["network"]["in"],
+        "net_out": sample["network"]["out"],
+        "established": sample["tcp_states"].get("ESTABLISHED", 0),
+        "syn_recv": sample["tcp_states"].get("SYN_RECV", 0),
+    }
+
+@lru_cache()
+def get_metrics_sampler() -> MetricsSampler:
+    """Single background psutil sampler shared by every /api/system/status caller"""
+    # Sample pertama cpu_percent() tidak bermakna; mulai hitung dari sekarang
+    psutil.cpu_percent(interval=None)
+    return MetricsSampler(
+        collect_system_health,
+        health_point,
+        interval=settings.SYSTEM_SAMPLE_INTERVAL,
+        history_size=settings.SYSTEM_HISTORY_SIZE,
+    )
+
+def get_system_health(history_seconds: int = 0):
+    """Latest sample from the sampler, plus the last ``history_seconds`` of points"""
+    sampler = get_metrics_sampler()
+    health = dict(sampler.latest())
+    if history_seconds:
+        health["history"] = sampler.history(history_seconds)
+    return health
+
 def factory_reset():
     """Wipes all data and resets to default state"""
     try:
@@ -492,7 +882,9 @@ def factory_reset():
             # 1. Truncate Tables
             cursor.execute("DELETE FROM ip_rules")
             cursor.execute("DELETE FROM waf_rule_toggles")
-            cursor.execute("DELETE FROM settings")
+            # waf_events tidak dihapus, jadi checkpoint tailer-nya juga dipertahankan
+            # (tanpa itu log di-replay dan event tersimpan dua kali setelah restart)
+            cursor.execute("DELETE FROM settings WHERE key != ?", (CHECKPOINT_KEY,))
             cursor.execute("DELETE FROM users")
 
             # 2. Restore Default Admin (admin/admin123)
@@ -505,8 +897,10 @@ def factory_reset():
             conn.commit()
 
         # 3. Reset Files
-        sync_ip_rules_file()
-        sync_exclusions_file()
+        invalidate_rule_matcher()
+        apply_ip_rules()
+        if sync_exclusions_file():
+            schedule_caddy_reload()
         
         default_hotlink = {
             "extensions": ["jpg", "jpeg", "png", "gif", "ico", "webp"],
@@ -516,8 +910,8 @@ def factory_reset():
         
         save_custom_rules("# Custom ModSecurity Rules\n# Add your custom rules here...\n")
         
-        # 4. Restart System
-        restart_caddy()
+        # 4. Restart System: tiap file yang berubah sudah minta reload, dan
+        # semuanya digabung jadi satu reload oleh scheduler
         
         return {"status": "success", "message": "Factory reset complete."}
         
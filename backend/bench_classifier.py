@@ -0,0 +1,248 @@
+import sys
+import time
+import random
+import re
+import argparse
+import datetime
+from collections import deque
+
+from app.services.attack_classifier import classifier, SIGNATURES
+
+# Micro-benchmark: attack classification throughput (lines/s).
+# Usage: python bench_classifier.py [--lines 1000000]
+
+user_agents = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15",
+    "Mozilla/5.0 (Linux; Android 11; SM-G991B) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.120 Mobile Safari/537.36",
+    "sqlmap/1.5.10#stable",
+    "Nikto/2.1.6",
+    "python-requests/2.25.1",
+]
+
+paths = ["/", "/dashboard", "/api/users", "/about", "/contact", "/products/123"]
+
+attack_paths = [
+    ("/products?id=1 OR 1=1", 403),
+    ("/search?q=<script>alert(1)</script>", 403),
+    ("/get_file?file=../../../../etc/passwd", 403),
+    ("/api/ping?host=127.0.0.1; cat /etc/shadow", 403),
+    ("/login", 401),
+    ("/.git/config", 403),
+    ("/upload", 413),
+    ("/api/search", 503),
+]
+
+
+def generate_lines(count: int):
+    random.seed(42)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    lines = []
+    for i in range(count):
+        ip = f"{random.randint(1,255)}.{random.randint(0,255)}.{random.randint(0,255)}.{random.randint(0,255)}"
+        timestamp = (now - datetime.timedelta(seconds=count - i)).strftime("[%d/%b/%Y:%H:%M:%S +0000]")
+        # 70% Normal traffic, 30% Attack (sama dengan generate_dummy_traffic.py)
+        if random.random() > 0.3:
+            path, status = random.choice(paths), 200
+            ua = random.choice(user_agents[:3])
+        else:
+            path, status = random.choice(attack_paths)
+            ua = random.choice(user_agents)
+        line = f'{ip} - - {timestamp} "GET {path} HTTP/1.1" {status} {random.randint(100, 5000)} "-" "{ua}"'
+        lines.append((line, status))
+    return lines
+
+
+# --- Previous implementation (two drifted if/elif chains) ---
+
+def legacy_attack_type(line, status_code):
+    line_lower = line.lower()
+    if "union" in line_lower or "select" in line_lower or " or " in line_lower or "='" in line:
+        return "SQL Injection"
+    if "<script>" in line_lower or "alert(" in line_lower or "onerror=" in line_lower:
+        return "XSS"
+    if "../" in line or "..%2f" in line_lower or "/etc/passwd" in line_lower:
+        return "LFI"
+    if "; cat" in line_lower or "; ls" in line_lower or "$(whoami)" in line_lower or "cmd=" in line_lower:
+        return "RCE"
+    if "nmap" in line_lower or "sqlmap" in line_lower or "nikto" in line_lower or "bot" in line_lower:
+        return "Scanner"
+    if "head /" in line_lower:
+        return "Scanner"
+    if "login" in line_lower or "admin" in line_lower:
+        return "Brute Force"
+    if status_code == 503:
+        return "HTTP Flood"
+    if status_code in [400, 405, 413, 414]:
+        return "Protocol Violation"
+    if status_code >= 400 and status_code < 500:
+        return "Suspicious"
+    return "Safe"
+
+
+def legacy_category(line):
+    line_lower = line.lower()
+    if "union" in line_lower or "select" in line_lower or " or " in line_lower or "='" in line:
+        return "sql_injection"
+    elif "<script>" in line_lower or "alert(" in line_lower or "onerror=" in line_lower:
+        return "xss"
+    elif "../" in line or "..%2f" in line_lower or "/etc/passwd" in line_lower:
+        return "lfi"
+    elif "; cat" in line_lower or "; ls" in line_lower or "$(whoami)" in line_lower or "cmd=" in line_lower:
+        return "rce"
+    elif "nmap" in line_lower or "sqlmap" in line_lower or "nikto" in line_lower or "bot" in line_lower:
+        return "bad_bots"
+    elif "login" in line_lower or "admin" in line_lower:
+        return "brute_force"
+    elif " 503 " in line or "ratelimit" in line_lower:
+        return "dos"
+    elif " 400 " in line or " 405 " in line or " 413 " in line or " 414 " in line:
+        return "protocol"
+    return "bad_bots"
+
+
+def legacy_classify(line, status_code):
+    attack_type = legacy_attack_type(line, status_code)
+    category = legacy_category(line) if status_code in [403, 401] else None
+    return category, attack_type
+
+
+# --- Single-pass alternatives to the loop ---
+# Semua mengembalikan label yang sama dengan AttackClassifier: index signature
+# terkecil (prioritas tertinggi) yang cocok lewat pattern atau status code.
+
+def _signature_table():
+    sigs = sorted(SIGNATURES, key=lambda s: s["priority"])
+    by_status = {}
+    for i, sig in enumerate(sigs):
+        for status in sig.get("statuses", []):
+            by_status.setdefault(status, i)
+    labels = [sig["label"] for sig in sigs]
+
+    def label(best, status_code):
+        if best < len(sigs):
+            return labels[best]
+        return "Suspicious" if 400 <= status_code < 500 else "Safe"
+
+    return sigs, by_status, label
+
+
+def build_combined_regex():
+    """One alternation with a named group per signature; every match is visited
+    because the leftmost match is not necessarily the highest priority one."""
+    sigs, by_status, label = _signature_table()
+    rx = re.compile("|".join(
+        f"(?P<g{i}>{'|'.join(re.escape(p.lower()) for p in sig['patterns'])})"
+        for i, sig in enumerate(sigs) if sig["patterns"]
+    ))
+
+    def classify(line, status_code):
+        best = by_status.get(status_code, len(sigs))
+        for m in rx.finditer(line.lower()):
+            idx = int(m.lastgroup[1:])
+            if idx < best:
+                best = idx
+                if idx == 0:
+                    break
+        return label(best, status_code)
+
+    return classify
+
+
+def build_lookahead_regex():
+    """One anchored match: alternatives are tried in priority order, each a
+    lookahead over the whole line, so the first group that matches wins."""
+    sigs, by_status, label = _signature_table()
+    rx = re.compile("|".join(
+        f"(?=.*?(?:{'|'.join(re.escape(p.lower()) for p in sig['patterns'])}))(?P<g{i}>)"
+        for i, sig in enumerate(sigs) if sig["patterns"]
+    ), re.S)
+
+    def classify(line, status_code):
+        m = rx.match(line.lower())
+        best = min(int(m.lastgroup[1:]) if m else len(sigs), by_status.get(status_code, len(sigs)))
+        return label(best, status_code)
+
+    return classify
+
+
+def build_aho_corasick():
+    """Pure-Python Aho-Corasick automaton (pyahocorasick is not a dependency)."""
+    sigs, by_status, label = _signature_table()
+    none = len(sigs)
+    goto, fail, out = [{}], [0], [none]
+    for i, sig in enumerate(sigs):
+        for pattern in sig["patterns"]:
+            state = 0
+            for ch in pattern.lower():
+                if ch not in goto[state]:
+                    goto.append({})
+                    fail.append(0)
+                    out.append(none)
+                    goto[state][ch] = len(goto) - 1
+                state = goto[state][ch]
+            out[state] = min(out[state], i)
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for ch, nxt in goto[state].items():
+            queue.append(nxt)
+            f = fail[state]
+            while f and ch not in goto[f]:
+                f = fail[f]
+            fail[nxt] = goto[f].get(ch, 0) if goto[f].get(ch) != nxt else 0
+            out[nxt] = min(out[nxt], out[fail[nxt]])
+
+    def classify(line, status_code):
+        best = by_status.get(status_code, none)
+        state = 0
+        for ch in line.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state] < best:
+                best = out[state]
+        return label(best, status_code)
+
+    return classify
+
+
+def run(name, fn, lines):
+    start = time.perf_counter()
+    for line, status in lines:
+        fn(line, status)
+    elapsed = time.perf_counter() - start
+    rate = len(lines) / elapsed
+    print(f"{name:<28} {elapsed:8.2f}s {rate:14,.0f} lines/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attack classifier micro-benchmark")
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"Generating {args.lines:,} log lines...")
+    lines = generate_lines(args.lines)
+
+    alternatives = [
+        ("combined regex (finditer)", build_combined_regex()),
+        ("combined regex (lookahead)", build_lookahead_regex()),
+        ("aho-corasick (pure python)", build_aho_corasick()),
+    ]
+
+    # Sanity check: labels must agree with the old get_attack_type
+    mismatches = sum(1 for line, status in lines[:10000] if classifier.classify(line, status)[1] != legacy_attack_type(line, status))
+    print(f"Label mismatches vs legacy (first 10k lines): {mismatches}")
+    for name, fn in alternatives:
+        mismatches = sum(1 for line, status in lines[:10000] if fn(line, status) != classifier.classify(line, status)[1])
+        print(f"Label mismatches {name} vs AttackClassifier: {mismatches}")
+
+    before = run("legacy (two chains)", legacy_classify, lines)
+    for name, fn in alternatives:
+        run(name, fn, lines)
+    after = run("AttackClassifier", classifier.classify, lines)
+    print(f"AttackClassifier vs legacy: {after / before:.2f}x")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import re
+
+import pytest
+
+import app.db
+from app.db import init_db, get_db_connection, get_pool
+from app.services import system_service, auth_service
+
+# Query-plan check: runs the system_service / auth_service code paths against a
+# scratch database, records every statement they execute and fails if one of
+# them scans a whole table or sorts in a temp b-tree.
+
+# Intended reads of a whole table (or a whole partial index), matched on the
+# normalised SQL, with the reason. Any other SCAN fails the check.
+FULL_READS = {
+    "SELECT rule_id, enabled FROM waf_rule_toggles": "one row per WAF_RULES_DB entry at most",
+    "SELECT rule_id FROM waf_rule_toggles WHERE enabled = 0 ORDER BY rule_id": "one row per WAF_RULES_DB entry at most",
+    "SELECT ip, action, note, duration, region, status, created_at FROM ip_rules ORDER BY id": "export streams every rule",
+    "SELECT * FROM ip_rules ORDER BY created_at DESC": "rules page lists every rule, in index order",
+    "SELECT ip, duration, created_at FROM ip_rules WHERE duration != 'Permanent'": "partial index holds only temporary bans",
+}
+
+SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)\b")
+
+
+@pytest.fixture
+def statements(tmp_path, monkeypatch):
+    """Scratch DB and config files; every SQL statement run on pooled connections"""
+    monkeypatch.setattr(app.db, "DB_FILE", str(tmp_path / "waf_data.db"))
+    for name in ("IP_RULES_FILE", "EXCLUSION_FILE", "CUSTOM_RULES_FILE", "HOTLINK_CADDY_FILE"):
+        monkeypatch.setattr(system_service, name, str(tmp_path / name.lower()))
+    monkeypatch.setattr(system_service, "restart_caddy", lambda: {"status": "success", "message": "skipped"})
+    system_service.get_reload_scheduler.cache_clear()
+    system_service.get_rule_expiry.cache_clear()
+    system_service.invalidate_rule_matcher()
+    init_db()
+
+    recorded = []
+    pool = get_pool()
+    pool.set_trace_callback(recorded.append)
+    yield recorded
+    pool.set_trace_callback(None)
+    system_service.get_reload_scheduler().stop()
+    system_service.get_reload_scheduler.cache_clear()
+    system_service.get_rule_expiry().stop()
+    system_service.get_rule_expiry.cache_clear()
+    app.db.close_pool()
+
+
+def exercise():
+    """Hot paths of the dashboard API."""
+    auth_service.get_user_by_username("admin")
+    auth_service.update_profile("admin", "Administrator")
+    system_service.add_waf_rule("203.0.113.7", "deny", "check", "24h")
+    system_service.add_waf_rule("198.51.100.0/24", "deny")
+    system_service.add_waf_rule("198.51.100.9", "allow")
+    system_service.get_ip_rules()
+    system_service.invalidate_rule_matcher()
+    system_service.get_rule_matcher()
+    system_service.import_ip_rules("192.0.2.1\n192.0.2.2\n", duration="1h")
+    "".join(system_service.export_ip_rules("csv"))
+    system_service.get_rule_expiry.cache_clear()
+    system_service.get_rule_expiry()
+    system_service.expire_ip_rules(["203.0.113.7"])
+    system_service.auto_ban_ips(["192.0.2.50"], "check", "1h")
+    system_service.get_waf_rules()
+    system_service.toggle_rule("SQL-01", False)
+    system_service.get_hotlink_config()
+    system_service.save_hotlink_config(system_service.get_hotlink_config())
+    system_service.delete_ip_rule("198.51.100.9")
+
+
+def plan_problems(conn, sql):
+    problems = []
+    for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+        detail = row[3]
+        if SCAN.match(detail) and sql not in FULL_READS:
+            problems.append(f"full table scan ({detail})")
+        elif "USE TEMP B-TREE" in detail:
+            problems.append(detail)
+    return problems
+
+
+def test_hot_queries_use_indexes(statements):
+    exercise()
+    get_pool().set_trace_callback(None)
+
+    checked = set()
+    failures = {}
+    with get_db_connection() as conn:
+        for sql in statements:
+            sql = " ".join(sql.split())
+            if sql in checked or not sql.upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT")):
+                continue
+            checked.add(sql)
+            problems = plan_problems(conn, sql)
+            if problems:
+                failures[sql] = problems
+
+    assert len(checked) > 20, "exercise() ran fewer statements than expected"
+    assert not failures, "\n".join(f"{sql}\n    " + "\n    ".join(p) for sql, p in failures.items())
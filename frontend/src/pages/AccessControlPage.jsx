@@ -87,9 +87,9 @@ const AccessControlPage = () => {
     };
 
     const handleUnblockIp = async (ip) => {
-        // Optimistic Update
+        // Optimistic Update (ip can be a CIDR rule covering several rows)
         setActiveIps(prev => prev.map(item => 
-            item.ip === ip ? { ...item, rule_status: 'None' } : item
+            (item.matched_rule || item.ip) === ip ? { ...item, rule_status: 'None' } : item
         ));
 
         try {
@@ -309,7 +309,7 @@ const AccessControlPage = () => {
                                                 <td className="px-6 py-4 text-right">
                                                     {item.rule_status === 'Blocked' ? (
                                                         <button 
-                                                            onClick={() => handleUnblockIp(item.ip)}
+                                                            onClick={() => handleUnblockIp(item.matched_rule || item.ip)}
                                                             className="cursor-pointer text-xs font-medium px-3 py-1.5 rounded bg-slate-200 dark:bg-slate-700 hover:bg-slate-300 dark:hover:bg-slate-600 text-slate-700 dark:text-white shadow-sm transition-all active:scale-95"
                                                         >
                                                             Unblock
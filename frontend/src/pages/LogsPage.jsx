@@ -21,6 +21,10 @@ const LogsPage = () => {
     const [page, setPage] = useState(1);
     const [totalPages, setTotalPages] = useState(1);
     const [totalEvents, setTotalEvents] = useState(0);
+    const [totalIsEstimate, setTotalIsEstimate] = useState(false);
+    const [hasNextPage, setHasNextPage] = useState(false);
+    // Keyset cursor per page number (dari next_cursor halaman sebelumnya)
+    const cursorsRef = useRef({});
     const [search, setSearch] = useState("");
     const [notification, setNotification] = useState(null);
     
@@ -32,6 +36,11 @@ const LogsPage = () => {
     // Live Tail
     const [isLiveTail, setIsLiveTail] = useState(false);
 
+    // Filter berubah: cursor lama tidak berlaku lagi (harus sebelum effect fetch)
+    useEffect(() => {
+        cursorsRef.current = {};
+    }, [search, activeFilter, statusFilter, timeRange]);
+
     // Live Tail effect
     useEffect(() => {
         let interval;
@@ -53,8 +62,12 @@ const LogsPage = () => {
     const fetchLogs = async (silent = false) => {
         if (!silent) setLoading(true);
         try {
+            // Cursor = lanjut setelah baris terakhir halaman sebelumnya (tanpa OFFSET);
+            // halaman yang belum punya cursor (lompat jauh) tetap pakai nomor halaman
+            const cursor = cursorsRef.current[page];
             const res = await getLogs({ 
                 page, 
+                cursor: cursor || undefined,
                 limit: 10, 
                 search: search || undefined,
                 status: statusFilter,
@@ -65,6 +78,9 @@ const LogsPage = () => {
             setLogs(data.data);
             setTotalPages(data.total_pages);
             setTotalEvents(data.total);
+            setTotalIsEstimate(data.total_is_estimate);
+            setHasNextPage(Boolean(data.next_cursor));
+            if (data.next_cursor) cursorsRef.current[page + 1] = data.next_cursor;
         } catch (err) {
             console.error("Failed to fetch logs", err);
         } finally {
@@ -72,6 +88,9 @@ const LogsPage = () => {
         }
     };
 
+    // Total di atas cap hanya batas bawah: halaman setelah yang terakhir diketahui tetap bisa dibuka
+    const pageCount = totalIsEstimate ? Math.max(totalPages, page + (hasNextPage ? 1 : 0)) : totalPages;
+
     const handleSearch = (e) => {
         setSearch(e.target.value);
         setPage(1); // Reset to first page
@@ -345,6 +364,9 @@ const LogsPage = () => {
                                         </td>
                                         <td className="px-6 py-4 whitespace-nowrap">
                                             <span className="dark:text-slate-200 text-slate-700 font-medium">{log.source_ip}</span>
+                                            {log.rule_status === 'Blocked' && (
+                                                <span className="ml-2 text-[10px] font-bold px-1.5 py-0.5 rounded bg-rose-500/20 text-rose-500 border border-rose-500/20">BLOCKED</span>
+                                            )}
                                         </td>
                                         <td className="px-6 py-4 whitespace-nowrap">
                                             <span className={`font-bold text-xs ${
@@ -379,7 +401,7 @@ const LogsPage = () => {
                 {/* Footer / Pagination */}
                 <div className="dark:bg-slate-950/30 bg-slate-50 px-6 py-4 border-t dark:border-slate-800 border-slate-200 flex justify-between items-center">
                     <div className="text-xs text-slate-500">
-                        Showing <span className="font-bold dark:text-slate-300 text-slate-700">{logs.length > 0 ? (page - 1) * 10 + 1 : 0}</span> to <span className="font-bold dark:text-slate-300 text-slate-700">{Math.min(page * 10, totalEvents)}</span> of <span className="font-bold dark:text-slate-300 text-slate-700">{totalEvents.toLocaleString()}</span> events
+                        Showing <span className="font-bold dark:text-slate-300 text-slate-700">{logs.length > 0 ? (page - 1) * 10 + 1 : 0}</span> to <span className="font-bold dark:text-slate-300 text-slate-700">{(page - 1) * 10 + logs.length}</span> of <span className="font-bold dark:text-slate-300 text-slate-700">{totalEvents.toLocaleString()}{totalIsEstimate ? "+" : ""}</span> events
                     </div>
                     
                     <div className="flex gap-2">
@@ -392,12 +414,12 @@ const LogsPage = () => {
                         </button>
                         
                         {/* Simple Pagination Buttons */}
-                        {[...Array(Math.min(5, totalPages))].map((_, idx) => {
+                        {[...Array(Math.min(5, pageCount))].map((_, idx) => {
                             let p = idx + 1;
-                            if (totalPages > 5 && page > 3) {
+                            if (pageCount > 5 && page > 3) {
                                 p = page - 2 + idx;
                             }
-                            if (p > totalPages) return null;
+                            if (p > pageCount) return null;
                             
                             return (
                                 <button 
@@ -415,8 +437,8 @@ const LogsPage = () => {
                         })}
 
                         <button 
-                            disabled={page >= totalPages}
-                            onClick={() => setPage(p => Math.min(totalPages, p + 1))}
+                            disabled={!hasNextPage}
+                            onClick={() => setPage(p => p + 1)}
                             className="p-2 dark:bg-slate-800 bg-white border dark:border-slate-700 border-slate-200 rounded hover:bg-slate-100 dark:hover:bg-slate-700 disabled:opacity-50 disabled:cursor-not-allowed dark:text-slate-400 text-slate-600 hover:text-slate-900 dark:hover:text-white transition-colors shadow-sm"
                         >
                             <ChevronRight className="w-4 h-4" />
@@ -72,12 +72,23 @@ const ServerMonitorPage = () => {
     const fetchStatus = async (isBackground = false) => {
         if (!isBackground) setLoading(true);
         try {
-            const res = await getSystemStatus();
+            // Load pertama: isi grafik dari history sampler (40 detik terakhir)
+            const res = await getSystemStatus(isBackground ? 0 : 40);
             const data = res.data;
             setStatus(data);
 
+            const formatTime = (date) => date.toLocaleTimeString('en-US', {hour12: false, hour: "2-digit", minute: "2-digit", second: "2-digit"});
+            if (data.history) {
+                const points = data.history.slice(-20);
+                setHistory({
+                    cpu: points.map(p => ({ time: formatTime(new Date(p.ts * 1000)), value: p.cpu })),
+                    net: points.map(p => ({ time: formatTime(new Date(p.ts * 1000)), in: p.net_in, out: p.net_out })),
+                });
+                return;
+            }
+
             // Update History for Charts
-            const now = new Date().toLocaleTimeString('en-US', {hour12: false, hour: "2-digit", minute: "2-digit", second: "2-digit"});
+            const now = formatTime(new Date());
             
             setHistory(prev => {
                 const newCpu = [...prev.cpu, { time: now, value: data.cpu_usage }].slice(-20); // Keep last 20 points
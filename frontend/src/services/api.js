@@ -41,13 +41,15 @@ export const exportReport = (format = "html", timeRange = "24h") => api.get(`/re
 export const addWafRule = (ip, action, note = "", duration = "Permanent") => api.post('/waf/rule', { ip, action, note, duration });
 export const getActiveIps = () => api.get('/waf/active-ips');
 export const getIpRules = () => api.get('/waf/ip-rules');
-export const deleteIpRule = (ip) => api.delete(`/waf/rule?ip=${ip}`);
+export const deleteIpRule = (ip) => api.delete('/waf/rule', { params: { ip } });
+export const importIpRules = (content, format = "auto", action = "deny", note = "", duration = "Permanent") => api.post('/waf/ip-rules/import', content, { params: { format, action, note, duration }, headers: { 'Content-Type': 'text/plain' } });
+export const exportIpRules = (format = "csv") => api.get('/waf/ip-rules/export', { params: { format }, responseType: 'blob' });
 export const getRules = () => api.get('/waf/rules');
 export const toggleRule = (rule_id, enable) => api.post('/waf/rules/toggle', { rule_id, enable });
 export const getCustomRules = () => api.get('/waf/custom');
 export const saveCustomRules = (content) => api.post('/waf/custom', { content });
 export const restartNginx = () => api.post('/system/restart');
-export const getSystemStatus = () => api.get('/system/status');
+export const getSystemStatus = (history = 0) => api.get('/system/status', { params: history ? { history } : {} });
 export const clearWafCache = () => api.post('/system/clear-cache');
 export const manageService = (serviceName, action) => api.post(`/system/services/${serviceName}/${action}`);
 export const factoryReset = () => api.post('/system/factory-reset');